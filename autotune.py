@@ -0,0 +1,347 @@
+"""
+YellowCert Autotune - pick batch size and image size by probing the device
+
+Replaces the VRAM rules of colab_memory_fix.py. For each candidate
+(batch, imgsz) the model runs a few real forward + backward passes on
+the training device, measuring:
+
+    - images per second
+    - peak memory: CUDA allocator peak on GPU, process RSS on CPU,
+      plus room for the AdamW optimizer state
+
+A candidate fits when its peak stays under AUTOTUNE_MEMORY_FRACTION of
+the device memory (free RAM on CPU). The requested image size is kept
+if any batch fits at it (image size is an accuracy choice), otherwise
+the next smaller size is tried. At the kept size the requested batch
+is kept whenever it fits; a larger batch replaces it only if it is at
+least PLATEAU_GAIN times faster, and batches stop growing once that
+fails or memory runs out. If the requested batch does not fit, the
+largest smaller one that does is used.
+
+Decisions are cached in cache/autotune.json per model, device and
+request, so only the first run on a machine pays for the probes.
+
+Usage:
+    python autotune.py --model yolov8m.pt --imgsz 1024 --batch 16
+    python autotune.py --model yolov8x.pt --device 0 --imgsz 1280 --refresh
+
+Training scripts call it through training.train(); set AUTOTUNE=0 to
+train with the preset's batch and imgsz as written.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Autotune configuration
+# Set AUTOTUNE=0 to use preset batch/imgsz unchanged
+USE_AUTOTUNE = os.getenv("AUTOTUNE", "1") != "0"
+# Share of device memory (free RAM on CPU) a training step may use
+AUTOTUNE_MEMORY_FRACTION = float(os.getenv("AUTOTUNE_MEMORY_FRACTION", "0.8"))
+# Stop probing new candidates after this many seconds
+AUTOTUNE_SECONDS = float(os.getenv("AUTOTUNE_SECONDS", "180"))
+AUTOTUNE_CACHE = os.path.join("cache", "autotune.json")
+
+# Smaller image sizes tried when nothing fits at the requested one
+IMGSZ_FALLBACKS = (1280, 1024, 832, 640, 512, 416)
+MAX_BATCH = {"cuda": 64, "cpu": 32}
+# A larger batch must be at least this much faster to count as an improvement
+PLATEAU_GAIN = 1.05
+# Bumped when the selection rules change, so cached decisions are re-probed
+DECISION_VERSION = 2
+# AdamW keeps two float32 moments per parameter
+OPTIMIZER_STATE_COPIES = 2
+
+
+class RssSampler:
+    """Peak resident memory of this process while a block runs (CPU probes)"""
+
+    def __init__(self, interval: float = 0.005):
+        import psutil
+
+        self._process = psutil.Process()
+        self._interval = interval
+        self._stop = threading.Event()
+        self.peak = 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._process.memory_info().rss)
+            self._stop.wait(self._interval)
+
+    def __enter__(self):
+        self.peak = self._process.memory_info().rss
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._process.memory_info().rss)
+
+
+def _tensors(output):
+    """Every tensor in a (nested) model output"""
+    if hasattr(output, "float"):
+        yield output
+    elif isinstance(output, dict):
+        for item in output.values():
+            yield from _tensors(item)
+    elif isinstance(output, (list, tuple)):
+        for item in output:
+            yield from _tensors(item)
+
+
+def _is_oom(error: Exception) -> bool:
+    return "out of memory" in str(error).lower() or type(error).__name__ == "OutOfMemoryError"
+
+
+def device_info(device) -> Dict[str, Any]:
+    """Kind, name and memory budget of the training device"""
+    import psutil
+    import torch
+
+    if device != "cpu" and torch.cuda.is_available():
+        index = int(device) if str(device).isdigit() else 0
+        props = torch.cuda.get_device_properties(index)
+        return {"kind": "cuda", "index": index, "name": props.name, "memory": props.total_memory}
+    return {"kind": "cpu", "index": None, "name": f"{platform.processor() or platform.machine()} x{os.cpu_count()}",
+            "memory": psutil.virtual_memory().available}
+
+
+def probe(module, info: Dict[str, Any], batch: int, imgsz: int, amp: bool = True,
+          steps: int = 2) -> Tuple[bool, float, int]:
+    """
+    Run warm-up + `steps` training steps; returns (fits, images/s, peak bytes)
+
+    The loss is the sum of the raw head outputs: the backward pass keeps
+    the same activations as the real detection loss, which is what
+    dominates training memory.
+    """
+    import torch
+
+    cuda = info["kind"] == "cuda"
+    target = torch.device(f"cuda:{info['index']}" if cuda else "cpu")
+    optimizer_bytes = OPTIMIZER_STATE_COPIES * sum(p.numel() * 4 for p in module.parameters())
+    budget = info["memory"] * AUTOTUNE_MEMORY_FRACTION
+
+    def step(x):
+        with torch.autocast(device_type="cuda", enabled=cuda and amp):
+            loss = sum(t.float().sum() for t in _tensors(module(x)))
+        loss.backward()
+        module.zero_grad(set_to_none=True)
+
+    # CPU steps are slow and steady; one timed step is enough
+    timed = steps if cuda else 1
+    x = None
+    try:
+        if cuda:
+            torch.cuda.empty_cache()
+            torch.cuda.reset_peak_memory_stats(target)
+            x = torch.rand(batch, 3, imgsz, imgsz, device=target)
+            step(x)
+            torch.cuda.synchronize(target)
+            start = time.perf_counter()
+            for _ in range(timed):
+                step(x)
+            torch.cuda.synchronize(target)
+            elapsed = time.perf_counter() - start
+            peak = torch.cuda.max_memory_allocated(target)
+        else:
+            gc.collect()
+            with RssSampler() as sampler:
+                baseline = sampler.peak
+                x = torch.rand(batch, 3, imgsz, imgsz)
+                step(x)
+                start = time.perf_counter()
+                for _ in range(timed):
+                    step(x)
+                elapsed = time.perf_counter() - start
+            peak = sampler.peak - baseline
+    except RuntimeError as e:
+        if not _is_oom(e):
+            raise
+        return False, 0.0, 0
+    finally:
+        del x
+        module.zero_grad(set_to_none=True)
+        if cuda:
+            torch.cuda.empty_cache()
+
+    peak += optimizer_bytes
+    return peak <= budget, batch * timed / elapsed, peak
+
+
+def batch_candidates(requested: int, limit: int) -> List[int]:
+    """Powers of two from 2 up to limit, plus the requested batch"""
+    candidates = {requested} if 0 < requested <= limit else set()
+    size = 2
+    while size <= limit:
+        candidates.add(size)
+        size *= 2
+    return sorted(candidates)
+
+
+def imgsz_candidates(requested: int, tune_imgsz: bool) -> List[int]:
+    """Requested size first, then smaller fallbacks (multiples of 32)"""
+    if not tune_imgsz:
+        return [requested]
+    return [requested] + [size for size in IMGSZ_FALLBACKS if size < requested]
+
+
+def _load_decisions(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_decision(path: str, key: str, decision: Dict[str, Any]):
+    decisions = _load_decisions(path)
+    decisions[key] = decision
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Written under a temporary name: parallel sweep trials may tune at once
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(decisions, fh, indent=2)
+    os.replace(tmp, path)
+
+
+def autotune(
+    model: str,
+    device="cpu",
+    imgsz: int = 640,
+    batch: int = 16,
+    tune: Sequence[str] = ("batch", "imgsz"),
+    amp: bool = True,
+    refresh: bool = False,
+    cache_path: str = AUTOTUNE_CACHE
+) -> Dict[str, int]:
+    """
+    Best {"batch", "imgsz"} for training `model` on `device`
+
+    Only the keys listed in `tune` may change; the others keep the
+    requested value. Falls back to the request if nothing fits.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    info = device_info(device)
+    tune_batch, tune_imgsz = "batch" in tune, "imgsz" in tune
+    key = (f"v{DECISION_VERSION}|{model}|{info['kind']}:{info['name']}|imgsz={imgsz}|batch={batch}|tune={','.join(sorted(tune))}"
+           f"|fraction={AUTOTUNE_MEMORY_FRACTION}|amp={amp}")
+    # Free RAM varies between runs, so CPU decisions are also keyed by it (whole GB)
+    if info["kind"] == "cpu":
+        key += f"|ram={int(info['memory'] / (1 << 30))}G"
+
+    cached = None if refresh else _load_decisions(cache_path).get(key)
+    if cached:
+        print(f"✓ Autotune (cached): batch={cached['batch']}, imgsz={cached['imgsz']} "
+              f"({cached['images_per_second']:.1f} img/s on {info['name']})")
+        return {"batch": cached["batch"], "imgsz": cached["imgsz"]}
+
+    print(f"🔧 Autotuning {model} on {info['name']} ({info['memory'] / (1 << 30):.1f} GB, "
+          f"{AUTOTUNE_MEMORY_FRACTION:.0%} usable)")
+    module = YOLO(model).model
+    module.train()
+    for param in module.parameters():
+        param.requires_grad_(True)
+    if info["kind"] == "cuda":
+        module.to(f"cuda:{info['index']}")
+
+    limit = MAX_BATCH[info["kind"]]
+    budget = info["memory"] * AUTOTUNE_MEMORY_FRACTION
+    deadline = time.time() + AUTOTUNE_SECONDS
+
+    def measure(candidate: int, size: int) -> Tuple[bool, float, int]:
+        fits, speed, peak = probe(module, info, candidate, size, amp)
+        print(f"   imgsz={size:<5} batch={candidate:<3} {speed:7.1f} img/s  "
+              f"peak {peak / (1 << 30):5.2f} GB  {'fits' if fits else 'too large'}")
+        return fits, speed, peak
+
+    best: Optional[Tuple[float, int, int, int]] = None
+    for size in imgsz_candidates(imgsz, tune_imgsz):
+        candidates = batch_candidates(batch, limit) if tune_batch else [batch]
+        fits, speed, peak = measure(batch, size)
+        if fits:
+            # The requested batch stands unless a larger one is measurably faster
+            best = (speed, batch, size, peak)
+            for candidate in [c for c in candidates if c > batch]:
+                if time.time() > deadline:
+                    break
+                # Activations grow linearly with the batch: skip probes bound to overflow
+                # (on CPU an overflowing probe swaps or gets the process killed)
+                if best[3] / best[1] * candidate > budget:
+                    print(f"   imgsz={size:<5} batch={candidate:<3} skipped, would exceed the memory budget")
+                    break
+                fits, speed, peak = measure(candidate, size)
+                if not fits or speed < best[0] * PLATEAU_GAIN:
+                    break
+                best = (speed, candidate, size, peak)
+        else:
+            # Too large: the largest smaller batch that fits
+            for candidate in sorted((c for c in candidates if c < batch), reverse=True):
+                fits, speed, peak = measure(candidate, size)
+                if fits:
+                    best = (speed, candidate, size, peak)
+                    break
+        if best is not None:
+            # Keep the largest image size at which anything fits
+            break
+
+    del module
+    gc.collect()
+    if info["kind"] == "cuda":
+        torch.cuda.empty_cache()
+
+    if best is None:
+        print(f"⚠️  Autotune: no candidate fit, keeping batch={batch}, imgsz={imgsz}")
+        return {"batch": batch, "imgsz": imgsz}
+
+    speed, chosen_batch, chosen_imgsz, peak = best
+    print(f"✓ Autotune: batch={chosen_batch}, imgsz={chosen_imgsz} ({speed:.1f} img/s, "
+          f"peak {peak / (1 << 30):.2f} GB), requested batch={batch}, imgsz={imgsz}")
+    _save_decision(cache_path, key, {
+        "batch": chosen_batch,
+        "imgsz": chosen_imgsz,
+        "images_per_second": round(speed, 2),
+        "peak_bytes": peak,
+        "created": time.time()
+    })
+    return {"batch": chosen_batch, "imgsz": chosen_imgsz}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe the device for the fastest batch/imgsz that fits")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--device", default="auto", help="'auto', 'cpu' or a GPU id")
+    parser.add_argument("--imgsz", type=int, default=640, help="Requested (largest) image size")
+    parser.add_argument("--batch", type=int, default=16, help="Requested batch size")
+    parser.add_argument("--fixed-imgsz", action="store_true", help="Only tune the batch size")
+    parser.add_argument("--no-amp", action="store_true", help="Probe without mixed precision (GPU)")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached decisions")
+    args = parser.parse_args()
+
+    device = args.device
+    if device == "auto":
+        import torch
+        device = 0 if torch.cuda.is_available() else "cpu"
+
+    print("=" * 80)
+    print("YellowCert Autotune")
+    print("=" * 80)
+    tune = ("batch",) if args.fixed_imgsz else ("batch", "imgsz")
+    result = autotune(args.model, device, args.imgsz, args.batch, tune, amp=not args.no_amp, refresh=args.refresh)
+    print(f"\n💡 Train with: python training.py --set batch={result['batch']} imgsz={result['imgsz']}")
+    print("=" * 80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+YellowCert micro-batching scheduler
+Groups concurrent /predict uploads into a single YOLOv8 forward pass
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from dedup import NearDuplicateIndex
+from inference import InferencePool, QueueFullError, detect_batch
+from metrics import observe_batch
+from tiling import TILE_MODE
+
+# Batching configuration (see .env.example)
+# Larger batches raise throughput; every request may wait up to
+# BATCH_MAX_WAIT_MS for peers, which is added to its latency.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+
+
+class MicroBatcher:
+    """
+    Collects uploads until `max_batch_size` are waiting or the oldest has
+    waited `max_wait_ms`, then sends them to the pool as one batch.
+    Each caller receives only its own slice of the batch results.
+    A near-duplicate index, if given, is consulted inside the workers
+    with `scope` (see detect_batch).
+    """
+
+    def __init__(
+        self,
+        pool: InferencePool,
+        conf: float,
+        max_batch_size: int = BATCH_MAX_SIZE,
+        max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        near_dup: Optional[NearDuplicateIndex] = None,
+        scope: str = ""
+    ):
+        self.pool = pool
+        self.conf = conf
+        self.near_dup = near_dup
+        self.scope = scope
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._waiting: List[Tuple[bytes, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def waiting(self) -> int:
+        """Number of uploads waiting to be batched"""
+        return len(self._waiting)
+
+    async def submit(self, contents: bytes) -> Optional[Dict[str, Any]]:
+        """Queue one upload and wait for its detections"""
+        if self.pool.pending >= self.pool.capacity:
+            raise QueueFullError(f"Inference queue full ({self.pool.pending}/{self.pool.capacity})")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((contents, future))
+
+        if len(self._waiting) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Dispatch up to one full batch of waiting uploads"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._waiting[:self.max_batch_size]
+        self._waiting = self._waiting[self.max_batch_size:]
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        # Leftovers start a new wait window
+        if self._waiting:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+    async def _run(self, batch: List[Tuple[bytes, asyncio.Future]]):
+        """Run one batch in the pool and hand each caller its result"""
+        try:
+            results = await self.pool.submit(detect_batch, [contents for contents, _ in batch], self.conf,
+                                             TILE_MODE, self.near_dup, self.scope)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        observe_batch(results)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,118 @@
+"""
+YellowCert bulk prediction
+Streams NDJSON results for many uploads or a ZIP archive of scans
+"""
+
+import json
+import logging
+import shutil
+import tempfile
+import zipfile
+from itertools import islice
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from inference import InferencePool, detect_batch
+from metrics import observe_batch
+
+logger = logging.getLogger("yellowcert")
+
+
+def _spool(upload) -> Tuple[str, BinaryIO]:
+    """Copy one upload into a temp file owned by the response stream"""
+    spooled = tempfile.TemporaryFile()
+    upload.file.seek(0)
+    shutil.copyfileobj(upload.file, spooled)
+    spooled.seek(0)
+    return upload.filename or "upload", spooled
+
+
+async def spool_uploads(uploads) -> List[Tuple[str, BinaryIO]]:
+    """
+    Copy uploads to private temp files
+
+    FastAPI closes request files as soon as the endpoint returns, which is
+    before a StreamingResponse starts reading them.
+    """
+    return [await run_in_threadpool(_spool, upload) for upload in uploads]
+
+
+def iter_images(spooled: List[Tuple[str, BinaryIO]]) -> Iterator[Tuple[str, bytes]]:
+    """Yield (name, bytes) per image, reading ZIP members one at a time"""
+    for name, fh in spooled:
+        if zipfile.is_zipfile(fh):
+            fh.seek(0)
+            with zipfile.ZipFile(fh) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                        continue
+                    yield info.filename, archive.read(info)
+        else:
+            fh.seek(0)
+            yield name, fh.read()
+
+
+def format_result(name: str, result: Any, model_version: str) -> Dict[str, Any]:
+    """One per-image result, tagged with its filename"""
+    if isinstance(result, Exception):
+        line: Dict[str, Any] = {
+            "filename": name,
+            "success": False,
+            "error": f"Prediction failed: {str(result)}"
+        }
+    elif result is None:
+        line = {
+            "filename": name,
+            "success": False,
+            "error": "Invalid image file. Please upload a valid image."
+        }
+    else:
+        line = {
+            "filename": name,
+            "success": True,
+            "detections": result["detections"],
+            "count": len(result["detections"]),
+            "image_size": result["image_size"],
+            "model_version": model_version
+        }
+    return line
+
+
+def _format_line(name: str, result: Any, model_version: str) -> bytes:
+    """Serialize one per-image result as an NDJSON line"""
+    return (json.dumps(format_result(name, result, model_version)) + "\n").encode("utf-8")
+
+
+async def stream_predictions(
+    spooled: List[Tuple[str, BinaryIO]],
+    pool: InferencePool,
+    conf: float,
+    batch_size: int,
+    model_version: str
+) -> AsyncIterator[bytes]:
+    """
+    Run detection batch by batch and yield one NDJSON line per image
+
+    Only one batch of decoded bytes is held at a time, so memory stays flat
+    regardless of how many images the archive contains.
+    """
+    images = iter_images(spooled)
+    try:
+        while True:
+            chunk = await run_in_threadpool(lambda: list(islice(images, batch_size)))
+            if not chunk:
+                break
+
+            try:
+                results = await pool.submit_with_backoff(detect_batch, [contents for _, contents in chunk], conf)
+                observe_batch(results)
+            except Exception as e:
+                logger.error("❌ Error during batch prediction: %s", e)
+                results = [e] * len(chunk)
+
+            for (name, _), result in zip(chunk, results):
+                yield _format_line(name, result, model_version)
+    finally:
+        for _, fh in spooled:
+            fh.close()
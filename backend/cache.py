@@ -0,0 +1,184 @@
+"""
+YellowCert result cache
+Content-addressed LRU cache of /predict results for repeated uploads
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ingest import INGEST_IMGSZ
+from tiling import TILE_MODE
+
+# Cache configuration (see .env.example)
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_PATH = os.getenv(
+    "RESULT_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "cache", "results.sqlite3")
+)
+
+
+def model_identity(model_path: str) -> str:
+    """Identify a checkpoint by path and modification time"""
+    path = os.path.abspath(model_path)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0
+    return f"{path}@{mtime}"
+
+
+def cache_key(
+    contents: bytes,
+    conf: float,
+    identity: str,
+    tile_mode: str = TILE_MODE,
+    imgsz: int = INGEST_IMGSZ
+) -> str:
+    """Hash raw upload bytes together with everything that affects the result"""
+    digest = hashlib.sha256(contents)
+    digest.update(f"|conf={conf}|model={identity}|tile={tile_mode}|imgsz={imgsz}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Base class tracking hit/miss counters
+
+    The SQLite backend blocks on disk, so call get and set off the event loop.
+    """
+
+    backend = "none"
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any]):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the health endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class MemoryResultCache(ResultCache):
+    """In-process LRU cache"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        super().__init__(max_entries, ttl)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry[0]):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResultCache(ResultCache):
+    """On-disk LRU cache that survives restarts"""
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_PATH,
+        max_entries: int = RESULT_CACHE_SIZE,
+        ttl: float = RESULT_CACHE_TTL
+    ):
+        super().__init__(max_entries, ttl)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1]):
+                if row is not None:
+                    self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            # Evict least recently used rows beyond the size limit
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def create_result_cache(backend: str = RESULT_CACHE_BACKEND) -> Optional[ResultCache]:
+    """Build the configured cache backend, or None when caching is off"""
+    if backend == "memory":
+        return MemoryResultCache()
+    if backend == "sqlite":
+        return SQLiteResultCache()
+    if backend in ("off", "none", ""):
+        return None
+    raise ValueError(f"Unknown RESULT_CACHE_BACKEND '{backend}' (expected 'memory', 'sqlite' or 'off')")
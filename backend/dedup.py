@@ -0,0 +1,267 @@
+"""
+YellowCert near-duplicate index
+Perceptual-hash lookup that reuses detections for rescanned certificates
+
+The result cache only helps for byte-identical uploads. A rescan or a
+second photo of the same certificate differs in every byte but has the
+same 64-bit difference hash (dHash), give or take a few bits. Hashes
+are looked up with multi-index hashing: split into max_distance + 1
+chunks, any hash within max_distance bits matches at least one chunk
+exactly (pigeonhole), so only entries sharing a chunk are compared.
+Unlike a BK-tree this allows cheap removal, which the LRU bound needs.
+
+Certificates printed from the same template can hash close together,
+so keep NEAR_DUP_DISTANCE small and check the hit rate against a sample
+before raising it.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+# Near-duplicate configuration (see .env.example)
+# "off" (default), "memory" or "sqlite" (persists across restarts)
+NEAR_DUP_BACKEND = os.getenv("NEAR_DUP_BACKEND", "off")
+# Maximum Hamming distance (bits out of 64) for two uploads to count as the same scan
+NEAR_DUP_DISTANCE = int(os.getenv("NEAR_DUP_DISTANCE", "4"))
+NEAR_DUP_SIZE = int(os.getenv("NEAR_DUP_SIZE", "10000"))
+# Aspect ratios must agree within this fraction (dHash ignores aspect ratio)
+NEAR_DUP_ASPECT_TOLERANCE = float(os.getenv("NEAR_DUP_ASPECT_TOLERANCE", "0.02"))
+NEAR_DUP_PATH = os.getenv(
+    "NEAR_DUP_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "cache", "near_dup.sqlite3")
+)
+
+HASH_BITS = 64
+
+
+@dataclass
+class Fingerprint:
+    """Perceptual hash plus the upload size its detections are reported in"""
+    hash: int
+    width: int
+    height: int
+
+
+def dhash(img: np.ndarray) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 thumbnail"""
+    thumb = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    thumb = thumb.astype(np.int16)
+    bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def rescale_result(result: Dict[str, Any], width: int, height: int) -> Dict[str, Any]:
+    """Copy of a stored result with boxes scaled to a new upload size"""
+    sx = width / result["image_size"]["width"]
+    sy = height / result["image_size"]["height"]
+    return {
+        "detections": [
+            {
+                **detection,
+                "bbox": {
+                    "x1": detection["bbox"]["x1"] * sx,
+                    "y1": detection["bbox"]["y1"] * sy,
+                    "x2": detection["bbox"]["x2"] * sx,
+                    "y2": detection["bbox"]["y2"] * sy
+                }
+            }
+            for detection in result["detections"]
+        ],
+        "image_size": {"width": width, "height": height}
+    }
+
+
+class NearDuplicateIndex:
+    """
+    Bounded LRU index of perceptual hashes to detection results
+
+    Entries are scoped (model identity and threshold), so results from
+    another model version are never reused.
+    """
+
+    backend = "memory"
+
+    def __init__(
+        self,
+        max_distance: int = NEAR_DUP_DISTANCE,
+        max_entries: int = NEAR_DUP_SIZE,
+        aspect_tolerance: float = NEAR_DUP_ASPECT_TOLERANCE
+    ):
+        self.max_distance = max(0, min(max_distance, HASH_BITS - 1))
+        self.max_entries = max(1, max_entries)
+        self.aspect_tolerance = aspect_tolerance
+        self.hits = 0
+        self.misses = 0
+
+        # Chunk boundaries over the 64 bits, max_distance + 1 chunks
+        count = self.max_distance + 1
+        edges = [round(i * HASH_BITS / count) for i in range(count + 1)]
+        self._chunks = [(start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])]
+
+        # (scope, hash) -> (width, height, result), oldest first
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[int, int, Dict[str, Any]]]" = OrderedDict()
+        # One table per chunk: (scope, chunk value) -> hashes
+        self._tables: List[Dict[Tuple[str, int], Set[int]]] = [{} for _ in self._chunks]
+        self._lock = threading.Lock()
+
+    def _chunk_keys(self, scope: str, value: int) -> List[Tuple[str, int]]:
+        return [(scope, (value >> start) & mask) for start, mask in self._chunks]
+
+    def _insert(self, scope: str, value: int, width: int, height: int, result: Dict[str, Any]):
+        if (scope, value) not in self._entries:
+            for table, key in zip(self._tables, self._chunk_keys(scope, value)):
+                table.setdefault(key, set()).add(value)
+        self._entries[(scope, value)] = (width, height, result)
+        self._entries.move_to_end((scope, value))
+
+    def _remove(self, scope: str, value: int):
+        del self._entries[(scope, value)]
+        for table, key in zip(self._tables, self._chunk_keys(scope, value)):
+            bucket = table[key]
+            bucket.discard(value)
+            if not bucket:
+                del table[key]
+
+    def _evict(self) -> List[Tuple[str, int]]:
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            scope, value = next(iter(self._entries))
+            self._remove(scope, value)
+            evicted.append((scope, value))
+        return evicted
+
+    def get(self, fingerprint: Fingerprint, scope: str) -> Optional[Dict[str, Any]]:
+        """Detections of the closest stored near-duplicate, rescaled to this upload"""
+        aspect = fingerprint.width / fingerprint.height
+        with self._lock:
+            candidates = set()
+            for table, key in zip(self._tables, self._chunk_keys(scope, fingerprint.hash)):
+                candidates.update(table.get(key, ()))
+
+            best = None
+            for value in candidates:
+                distance = bin(value ^ fingerprint.hash).count("1")
+                if distance > self.max_distance or (best is not None and distance >= best[0]):
+                    continue
+                width, height, _ = self._entries[(scope, value)]
+                if abs(width / height - aspect) > aspect * self.aspect_tolerance:
+                    continue
+                best = (distance, value)
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end((scope, best[1]))
+            self._touch(scope, best[1])
+            _, _, result = self._entries[(scope, best[1])]
+        return rescale_result(result, fingerprint.width, fingerprint.height)
+
+    def set(self, fingerprint: Fingerprint, scope: str, result: Dict[str, Any]):
+        """Store the detections for a fingerprint"""
+        stored = {"detections": result["detections"], "image_size": result["image_size"]}
+        with self._lock:
+            self._insert(scope, fingerprint.hash, fingerprint.width, fingerprint.height, stored)
+            evicted = self._evict()
+            self._persist(scope, fingerprint, stored, evicted)
+
+    def _touch(self, scope: str, value: int):
+        """Hook for persistent backends: an entry was used"""
+
+    def _persist(self, scope: str, fingerprint: Fingerprint, result: Dict[str, Any],
+                 evicted: List[Tuple[str, int]]):
+        """Hook for persistent backends: an entry was stored and others evicted"""
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the health endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def _to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+class SQLiteNearDuplicateIndex(NearDuplicateIndex):
+    """
+    Near-duplicate index mirrored to SQLite and reloaded on start
+
+    get and set write to the database, so call them off the event loop.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = NEAR_DUP_PATH, **kwargs):
+        super().__init__(**kwargs)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS near_dup ("
+                "scope TEXT NOT NULL, hash INTEGER NOT NULL, width INTEGER NOT NULL, "
+                "height INTEGER NOT NULL, value TEXT NOT NULL, accessed REAL NOT NULL, "
+                "PRIMARY KEY (scope, hash))"
+            )
+            rows = self._conn.execute(
+                "SELECT scope, hash, width, height, value FROM near_dup ORDER BY accessed DESC LIMIT ?",
+                (self.max_entries,)
+            ).fetchall()
+            # Oldest first, so the LRU order survives the restart
+            for scope, value, width, height, result in reversed(rows):
+                self._insert(scope, value % (1 << HASH_BITS), width, height, json.loads(result))
+            self._conn.execute(
+                "DELETE FROM near_dup WHERE rowid IN ("
+                "SELECT rowid FROM near_dup ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def _touch(self, scope: str, value: int):
+        with self._conn:
+            self._conn.execute("UPDATE near_dup SET accessed = ? WHERE scope = ? AND hash = ?",
+                               (time.time(), scope, _to_signed(value)))
+
+    def _persist(self, scope: str, fingerprint: Fingerprint, result: Dict[str, Any],
+                 evicted: List[Tuple[str, int]]):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO near_dup (scope, hash, width, height, value, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (scope, _to_signed(fingerprint.hash), fingerprint.width, fingerprint.height,
+                 json.dumps(result), time.time())
+            )
+            self._conn.executemany("DELETE FROM near_dup WHERE scope = ? AND hash = ?",
+                                   [(old_scope, _to_signed(value)) for old_scope, value in evicted])
+
+
+def create_near_duplicate_index(backend: str = NEAR_DUP_BACKEND) -> Optional[NearDuplicateIndex]:
+    """Build the configured index, or None when near-duplicate reuse is off"""
+    if backend == "memory":
+        return NearDuplicateIndex()
+    if backend == "sqlite":
+        return SQLiteNearDuplicateIndex()
+    if backend in ("off", "none", ""):
+        return None
+    raise ValueError(f"Unknown NEAR_DUP_BACKEND '{backend}' (expected 'memory', 'sqlite' or 'off')")
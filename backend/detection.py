@@ -0,0 +1,91 @@
+"""
+YellowCert detection helpers
+Class names and YOLO result post-processing shared by the API and tools
+"""
+
+from typing import Callable, List, Dict, Any, Optional
+
+import numpy as np
+
+# Class names (from data.yaml)
+CLASS_NAMES = [
+    'cholera', 'covid', 'date', 'flu',
+    'logo', 'meningo', 'signature', 'yellowfever'
+]
+
+def process_detection(box, class_names: List[str]) -> Dict[str, Any]:
+    """Process a single detection box (per-box reference for process_boxes)"""
+    # Get box coordinates (xyxy format)
+    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+
+    # Get class and confidence
+    cls = int(box.cls[0].cpu().numpy())
+    conf = float(box.conf[0].cpu().numpy())
+
+    # Get class name
+    class_name = class_names[cls] if cls < len(class_names) else f"class_{cls}"
+
+    return {
+        "class": class_name,
+        "confidence": round(conf, 2),
+        "bbox": {
+            "x1": float(x1),
+            "y1": float(y1),
+            "x2": float(x2),
+            "y2": float(y2)
+        }
+    }
+
+def process_boxes(
+    boxes,
+    class_names: List[str],
+    xyxy_transform: Optional[Callable[[np.ndarray], np.ndarray]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Process every box of one result at once
+
+    Moves xyxy, cls and conf to host memory once per result instead of
+    three times per box. Output matches process_detection box for box.
+    xyxy_transform, if given, maps the (N, 4) box array to another
+    coordinate space (e.g. from the letterboxed input back to the upload).
+    """
+    if len(boxes) == 0:
+        return []
+
+    xyxy = boxes.xyxy.cpu().numpy()
+    if xyxy_transform is not None:
+        xyxy = xyxy_transform(xyxy)
+    return process_arrays(xyxy, boxes.cls.cpu().numpy(), boxes.conf.cpu().numpy(), class_names)
+
+def process_arrays(
+    xyxy: np.ndarray,
+    cls: np.ndarray,
+    conf: np.ndarray,
+    class_names: List[str]
+) -> List[Dict[str, Any]]:
+    """Format (N, 4) boxes with their class ids and confidences as detections"""
+    xyxy = xyxy.tolist()
+    cls = cls.astype(np.int64)
+    conf = conf.tolist()
+    if not xyxy:
+        return []
+
+    # Map class ids to names, falling back to class_<id> for unknown ids
+    lookup = np.array(class_names, dtype=object)
+    names = lookup[np.clip(cls, 0, len(class_names) - 1)]
+    for i in np.flatnonzero(cls >= len(class_names)):
+        names[i] = f"class_{cls[i]}"
+
+    return [
+        {
+            "class": name,
+            "confidence": round(c, 2),
+            "bbox": {
+                "x1": x1,
+                "y1": y1,
+                "x2": x2,
+                "y2": y2
+            }
+        }
+        for name, c, (x1, y1, x2, y2) in zip(names.tolist(), conf, xyxy)
+    ]
@@ -0,0 +1,406 @@
+"""
+YellowCert inference worker pool
+Runs image decoding and YOLOv8 inference off the event loop
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dedup import Fingerprint, NearDuplicateIndex, dhash
+from detection import CLASS_NAMES, process_arrays, process_boxes
+from ingest import INGEST_IMGSZ, ingest_array, ingest_image, read_image_size
+from tiling import TILE_MODE, TiledImage, ingest_tiled, should_tile, tile_array
+
+# Pool configuration (see .env.example)
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "8"))
+RETRY_AFTER_SECONDS = int(os.getenv("INFERENCE_RETRY_AFTER", "2"))
+# Delay between retries when a multi-batch job finds the pool saturated
+BACKOFF_SECONDS = 0.05
+WARMUP_PASSES = int(os.getenv("WARMUP_PASSES", "2"))
+# Give up if a worker has not finished loading and warming up by then
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "600"))
+
+# Each worker thread/process keeps its own model: YOLO predictors are not thread-safe
+_worker = threading.local()
+
+# Models loaded before forking (see serve.py), keyed by path
+_preloaded: Dict[str, Any] = {}
+_preloaded_lock = threading.Lock()
+
+
+class QueueFullError(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+
+def init_worker(model_path: str, num_threads: int = 0):
+    """Load a private model copy for the current worker, using num_threads torch threads"""
+    import torch
+    from ultralytics import YOLO
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+
+    # The first worker adopts the pre-fork model; any others load their own copy
+    _worker.model = preloaded_model(model_path, claim=True) or YOLO(model_path, task="detect")
+    _worker.imgsz = model_input_size(_worker.model, model_path)
+
+
+def worker_input_size() -> int:
+    """Input size of the current worker's model (executes inside the pool, loading it)"""
+    return _worker.imgsz
+
+
+def preload_model(model_path: str):
+    """
+    Load and warm up a model before forking serving processes
+
+    The warm-up pass fuses layers and builds the predictor up front, so
+    forked workers never write to the weight pages and keep sharing them
+    copy-on-write with the parent.
+    """
+    import numpy as np
+    from ultralytics import YOLO
+
+    model = YOLO(model_path, task="detect")
+    imgsz = model_input_size(model, model_path)
+    model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+    _preloaded[model_path] = model
+    return model
+
+
+def preloaded_model(model_path: str, claim: bool = False):
+    """
+    Return the pre-fork model for model_path, or None
+
+    With claim=True the model is handed to one inference worker only,
+    since a single YOLO predictor must not be shared between threads.
+    """
+    with _preloaded_lock:
+        if claim:
+            return _preloaded.pop(model_path, None)
+        return _preloaded.get(model_path)
+
+
+def exported_input_size(model_path: str) -> Optional[int]:
+    """imgsz an ONNX / OpenVINO artifact was exported at, from the metadata Ultralytics embeds"""
+    import ast
+
+    imgsz = None
+    if os.path.isdir(model_path):
+        import yaml
+
+        metadata_path = os.path.join(model_path, "metadata.yaml")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, encoding="utf-8") as fh:
+                imgsz = (yaml.safe_load(fh) or {}).get("imgsz")
+    elif model_path.endswith(".onnx"):
+        import onnxruntime
+
+        session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        value = session.get_modelmeta().custom_metadata_map.get("imgsz")
+        imgsz = ast.literal_eval(value) if value else None
+
+    if not imgsz:
+        return None
+    return max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+
+def model_input_size(model, model_path: str) -> int:
+    """
+    Square input size to letterbox uploads to
+
+    Checkpoints store it in their training args; exported artifacts in
+    their metadata. An export without it is refused rather than served
+    at a guessed size, since boxes would then differ from the checkpoint.
+    """
+    if INGEST_IMGSZ > 0:
+        return INGEST_IMGSZ
+    if not model_path.endswith(".pt"):
+        imgsz = exported_input_size(model_path)
+        if imgsz is None:
+            raise RuntimeError(f"{model_path} has no imgsz metadata; set INGEST_IMGSZ to its export size")
+        return imgsz
+    imgsz = model.overrides.get("imgsz") or 640
+    return max(imgsz) if isinstance(imgsz, (list, tuple)) else int(imgsz)
+
+
+def ingest_upload(contents: bytes, imgsz: int, tile_mode: str = TILE_MODE):
+    """Prepare one upload for whole-image or tiled inference, whichever fits its size"""
+    dims = read_image_size(contents)
+    if dims is not None and should_tile(*dims, imgsz, tile_mode):
+        return ingest_tiled(contents, imgsz)
+    return ingest_image(contents, imgsz)
+
+
+def input_fingerprint(item) -> Fingerprint:
+    """dHash of an ingested upload, taken from its letterboxed pixels minus the padding"""
+    if isinstance(item, TiledImage):
+        view, (_, (left, top), _) = item.views[0], item.transforms[0]
+    else:
+        view, (left, top) = item.image, item.pad
+    height, width = view.shape[:2]
+    left, top = int(round(left)), int(round(top))
+    content = view[top:height - top, left:width - left]
+    return Fingerprint(hash=dhash(content), width=item.width, height=item.height)
+
+
+def detect_batch(
+    contents_list: List[bytes],
+    conf: float,
+    tile_mode: str = TILE_MODE,
+    near_dup: Optional[NearDuplicateIndex] = None,
+    scope: str = ""
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Ingest several uploads and run them through the model in one call
+    (executes inside the pool)
+
+    Returns one entry per upload, in order; None marks an invalid image.
+    Boxes and image_size are reported in original-upload coordinates.
+    Tiled uploads contribute all their tiles to the same forward pass.
+
+    With a near-duplicate index (thread pools only), each upload is
+    hashed from its ingested pixels: matches reuse the stored detections
+    and skip the forward pass, new results are added to the index.
+    """
+    imgsz = _worker.imgsz
+    inputs = []
+    decode_times = []
+    reused: Dict[int, Dict[str, Any]] = {}
+    fingerprints: Dict[int, Fingerprint] = {}
+    for index, contents in enumerate(contents_list):
+        start = time.perf_counter()
+        item = ingest_upload(contents, imgsz, tile_mode)
+        if near_dup is not None and item is not None:
+            fingerprint = input_fingerprint(item)
+            match = near_dup.get(fingerprint, scope)
+            if match is not None:
+                reused[index] = match
+                item = None
+            else:
+                fingerprints[index] = fingerprint
+        inputs.append(item)
+        decode_times.append(time.perf_counter() - start)
+
+    outputs = run_model(_worker.model, imgsz, inputs, decode_times, conf)
+    for index, fingerprint in fingerprints.items():
+        near_dup.set(fingerprint, scope, outputs[index])
+    for index, match in reused.items():
+        outputs[index] = match
+    return outputs
+
+
+def detect_pages(pages: List[Any], conf: float, tile_mode: str = TILE_MODE) -> List[Dict[str, Any]]:
+    """
+    Run already rendered BGR images (PDF pages) through the model in one
+    call (executes inside the pool)
+
+    Boxes and image_size are reported in rendered-page pixels.
+    """
+    imgsz = _worker.imgsz
+    inputs = []
+    decode_times = []
+    for page in pages:
+        start = time.perf_counter()
+        height, width = page.shape[:2]
+        if should_tile(width, height, imgsz, tile_mode):
+            inputs.append(tile_array(page, imgsz))
+        else:
+            inputs.append(ingest_array(page, imgsz))
+        decode_times.append(time.perf_counter() - start)
+    return run_model(_worker.model, imgsz, inputs, decode_times, conf)
+
+
+def run_model(
+    model,
+    imgsz: int,
+    inputs: List[Any],
+    decode_times: List[float],
+    conf: float
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    One forward pass over ingested inputs (see ingest_upload), then
+    per-input post-processing; None inputs give None results
+    """
+    valid = []
+    for item in inputs:
+        if isinstance(item, TiledImage):
+            valid.extend(item.views)
+        elif item is not None:
+            valid.append(item.image)
+
+    # Run one batched forward pass over every decodable image (and tile)
+    start = time.perf_counter()
+    results = iter(model(valid, conf=conf, imgsz=imgsz, verbose=False) if valid else [])
+    inference_time = time.perf_counter() - start
+
+    outputs = []
+    for item, decode_time in zip(inputs, decode_times):
+        if item is None:
+            outputs.append(None)
+            continue
+
+        # Process detections
+        start = time.perf_counter()
+        if isinstance(item, TiledImage):
+            views = [next(results) for _ in item.views]
+            detections = process_arrays(*item.merge(views), CLASS_NAMES)
+        else:
+            detections = process_boxes(next(results).boxes, CLASS_NAMES, item.to_original)
+
+        outputs.append({
+            "detections": detections,
+            "image_size": {
+                "width": item.width,
+                "height": item.height
+            },
+            # Stage timings in seconds, stripped by metrics.observe_batch
+            "timings": {
+                "decode": decode_time,
+                "inference": inference_time,
+                "postprocess": time.perf_counter() - start
+            }
+        })
+
+    return outputs
+
+
+def warm_up_worker(passes: int, batch_size: int, barrier, timeout: float) -> Tuple[str, float]:
+    """
+    Run dummy inference at the serving input size (executes inside the pool)
+
+    Each pass runs a single image and, when batching is on, a full batch,
+    so the kernels for both shapes are ready before real traffic arrives.
+    The worker then blocks on `barrier` until every worker has warmed up,
+    so no worker can take a second warm-up job while another takes none.
+    Returns the worker's id and the seconds spent.
+    """
+    import numpy as np
+
+    imgsz = _worker.imgsz
+    blank = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    start = time.perf_counter()
+    try:
+        for _ in range(passes):
+            _worker.model(blank, imgsz=imgsz, verbose=False)
+            if batch_size > 1:
+                _worker.model([blank] * batch_size, imgsz=imgsz, verbose=False)
+    except Exception:
+        # Release the workers already waiting instead of letting them time out
+        barrier.abort()
+        raise
+    elapsed = time.perf_counter() - start
+    barrier.wait(timeout)
+    return f"{os.getpid()}:{threading.get_ident()}", elapsed
+
+
+class InferencePool:
+    """
+    Bounded thread or process pool for inference jobs
+
+    At most `workers` jobs run at once and `queue_size` more may wait.
+    Anything beyond that is rejected immediately with QueueFullError so
+    callers can answer 503 instead of buffering uploads in memory.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        mode: str = INFERENCE_MODE,
+        workers: int = INFERENCE_WORKERS,
+        queue_size: int = INFERENCE_QUEUE_SIZE
+    ):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue_size)
+        self._pending = 0
+
+        # Split cores between workers so concurrent inferences don't oversubscribe them;
+        # OMP_NUM_THREADS (set per process by serve.py) is this process's share
+        cores = int(os.getenv("OMP_NUM_THREADS") or 0) or os.cpu_count() or 1
+        threads = max(1, cores // self.workers)
+        if mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=(model_path, threads)
+            )
+        elif mode == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="inference",
+                initializer=init_worker,
+                initargs=(model_path, threads)
+            )
+        else:
+            raise ValueError(f"Unknown INFERENCE_MODE '{mode}' (expected 'thread' or 'process')")
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs currently running or waiting"""
+        return self._pending
+
+    async def submit(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in the pool, or raise QueueFullError if saturated"""
+        if self._pending >= self.capacity:
+            raise QueueFullError(f"Inference queue full ({self._pending}/{self.capacity})")
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def submit_with_backoff(self, fn: Callable, *args) -> Any:
+        """
+        Like submit, but wait for a free slot instead of raising
+
+        For jobs made of several batches (bulk streams, PDFs), so work
+        already done isn't thrown away when the pool fills up midway.
+        """
+        while True:
+            try:
+                return await self.submit(fn, *args)
+            except QueueFullError:
+                await asyncio.sleep(BACKOFF_SECONDS)
+
+    async def warm_up(self, passes: int, batch_size: int = 1, timeout: float = WARMUP_TIMEOUT):
+        """
+        Start every worker (loading its model) and run warm-up passes
+
+        Returns only once each worker has run its own passes: one job per
+        worker, all held at a shared barrier until the last one arrives.
+        """
+        loop = asyncio.get_running_loop()
+        if self.mode == "process":
+            manager = multiprocessing.get_context("spawn").Manager()
+            barrier = manager.Barrier(self.workers)
+        else:
+            manager = None
+            barrier = threading.Barrier(self.workers)
+
+        try:
+            warmed = await asyncio.gather(*(
+                loop.run_in_executor(self._executor, warm_up_worker, passes, batch_size, barrier, timeout)
+                for _ in range(self.workers)
+            ))
+        finally:
+            if manager is not None:
+                manager.shutdown()
+
+        workers = {worker for worker, _ in warmed}
+        if len(workers) != self.workers:
+            raise RuntimeError(f"Warm-up reached {len(workers)} of {self.workers} workers")
+
+    def shutdown(self):
+        """Stop accepting work and release the workers"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,141 @@
+"""
+YellowCert image ingestion
+Size-aware decoding and letterboxing of uploads before inference
+"""
+
+import io
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Model input size; 0 = use the imgsz stored in the checkpoint
+INGEST_IMGSZ = int(os.getenv("INGEST_IMGSZ", "0"))
+
+# Letterbox padding colour used by Ultralytics
+PAD_VALUE = 114
+
+# cv2 reduced decode modes, largest factor first
+REDUCED_MODES = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+# EXIF orientations that rotate the image by 90 degrees
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+@dataclass
+class IngestedImage:
+    """A letterboxed model input plus what is needed to undo the transform"""
+    image: np.ndarray
+    width: int
+    height: int
+    ratio: Tuple[float, float]
+    pad: Tuple[float, float]
+    reduction: Tuple[float, float]
+
+    def to_original(self, xyxy: np.ndarray) -> np.ndarray:
+        """Map (N, 4) boxes from letterbox to original-image coordinates"""
+        boxes = xyxy.astype(np.float64, copy=True)
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - self.pad[0]) / self.ratio[0] * self.reduction[0]
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - self.pad[1]) / self.ratio[1] * self.reduction[1]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, self.width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, self.height)
+        return boxes
+
+
+def read_image_size(contents: bytes) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from the header only, honouring EXIF rotation"""
+    try:
+        with Image.open(io.BytesIO(contents)) as header:
+            width, height = header.size
+            orientation = header.getexif().get(0x0112, 1)
+    except Exception:
+        return None
+
+    if orientation in ROTATED_ORIENTATIONS:
+        width, height = height, width
+    return width, height
+
+
+def choose_decode_mode(width: int, height: int, target: int) -> Tuple[int, int]:
+    """Pick the largest reduction that still leaves the long side >= target"""
+    long_side = max(width, height)
+    for factor, mode in REDUCED_MODES:
+        if long_side // factor >= target:
+            return factor, mode
+    return 1, cv2.IMREAD_COLOR
+
+
+def letterbox(img: np.ndarray, size: int) -> Tuple[np.ndarray, Tuple[float, float], Tuple[float, float]]:
+    """
+    Resize keeping aspect ratio and pad to a size x size square
+
+    Returns the padded image, the per-axis scale actually applied after
+    rounding, and the (left, top) padding.
+    """
+    h, w = img.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+
+    if (new_w, new_h) != (w, h):
+        interpolation = cv2.INTER_AREA if ratio < 1 else cv2.INTER_LINEAR
+        img = cv2.resize(img, (new_w, new_h), interpolation=interpolation)
+
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                             value=(PAD_VALUE, PAD_VALUE, PAD_VALUE))
+    return img, (new_w / w, new_h / h), (left, top)
+
+
+def ingest_image(contents: bytes, size: int) -> Optional[IngestedImage]:
+    """
+    Decode an upload at the smallest resolution that still covers the
+    model input, then letterbox it once to size x size
+
+    Returns None if the bytes are not a decodable image.
+    """
+    dims = read_image_size(contents)
+    factor, mode = choose_decode_mode(*dims, size) if dims else (1, cv2.IMREAD_COLOR)
+
+    nparr = np.frombuffer(contents, np.uint8)
+    img = cv2.imdecode(nparr, mode)
+    if img is None:
+        return None
+
+    decoded_h, decoded_w = img.shape[:2]
+    if dims is None or factor == 1:
+        width, height = decoded_w, decoded_h
+    else:
+        width, height = dims
+
+    boxed, ratio, pad = letterbox(img, size)
+    return IngestedImage(
+        image=boxed,
+        width=width,
+        height=height,
+        ratio=ratio,
+        pad=pad,
+        reduction=(width / decoded_w, height / decoded_h)
+    )
+
+
+def ingest_array(img: np.ndarray, size: int) -> IngestedImage:
+    """Letterbox an already decoded BGR image (e.g. a rendered PDF page)"""
+    height, width = img.shape[:2]
+    boxed, ratio, pad = letterbox(img, size)
+    return IngestedImage(
+        image=boxed,
+        width=width,
+        height=height,
+        ratio=ratio,
+        pad=pad,
+        reduction=(1.0, 1.0)
+    )
@@ -0,0 +1,329 @@
+"""
+YellowCert job queue
+Persistent background jobs for re-processing large archives
+
+Uploads are written to disk and tracked per image in SQLite, so a job
+survives restarts. Drain workers claim a batch of images at a time under
+a lease: if the process dies mid-batch the lease expires and another
+worker (or the restarted process) picks the images up again. Failed
+batches are retried up to JOB_MAX_ATTEMPTS times.
+
+Jobs only use the inference pool when no /predict request is in flight
+or waiting and the pool has an idle worker, so /predict keeps its
+latency. Every store call runs on the threadpool: with several serving
+processes sharing the database, waiting for its write lock must not
+stall the event loop.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from bulk import format_result, iter_images
+from inference import detect_batch
+from metrics import observe_batch
+
+logger = logging.getLogger("yellowcert")
+
+# Job queue configuration (see .env.example)
+JOBS_PATH = os.getenv(
+    "JOBS_PATH",
+    os.path.join(os.path.dirname(__file__), "..", "cache", "jobs.sqlite3")
+)
+# Uploads waiting to be processed; each job gets its own subdirectory
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(os.path.dirname(__file__), "..", "cache", "jobs"))
+# Drain workers per serving process (0 = only accept jobs, never process them)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Claimed images go back to the queue if not finished within this many seconds
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Idle wait between checks for new work or a free pool
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+
+# (job_id, position, filename, path, attempts)
+ClaimedItem = Tuple[str, int, str, str, int]
+
+
+class JobStore:
+    """
+    SQLite-backed job and per-image item tables, shared by every process
+
+    All methods block (file I/O, or waiting up to 30s for another
+    process's write lock): call them through run_in_threadpool.
+    """
+
+    def __init__(self, path: str = JOBS_PATH, upload_dir: str = JOBS_DIR):
+        self.upload_dir = os.path.abspath(upload_dir)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        os.makedirs(self.upload_dir, exist_ok=True)
+        # Transactions are explicit (BEGIN IMMEDIATE) so claims are atomic across processes
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._transaction():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, created REAL NOT NULL, total INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                "job_id TEXT NOT NULL, position INTEGER NOT NULL, filename TEXT NOT NULL, "
+                "path TEXT, created REAL NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL, "
+                "result TEXT, error TEXT, finished REAL, "
+                "PRIMARY KEY (job_id, position))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS items_status ON items (status, created)")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def create(self, uploads: List[Tuple[str, BinaryIO]]) -> Optional[str]:
+        """
+        Store uploads (ZIP archives are expanded) as a new job
+
+        Returns the job id, or None if the uploads contained no files.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.upload_dir, job_id)
+        os.makedirs(job_dir)
+
+        rows = []
+        for position, (name, contents) in enumerate(iter_images(uploads)):
+            path = os.path.join(job_dir, str(position))
+            with open(path, "wb") as fh:
+                fh.write(contents)
+            rows.append((job_id, position, name, path))
+
+        if not rows:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return None
+
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("INSERT INTO jobs (id, created, total) VALUES (?, ?, ?)", (job_id, now, len(rows)))
+            conn.executemany(
+                "INSERT INTO items (job_id, position, filename, path, created, status) "
+                "VALUES (?, ?, ?, ?, ?, 'queued')",
+                [row + (now,) for row in rows]
+            )
+        return job_id
+
+    def claim(self, limit: int) -> List[ClaimedItem]:
+        """Lease up to `limit` queued (or abandoned) images, oldest job first"""
+        now = time.time()
+        with self._transaction() as conn:
+            # Images whose worker died on every attempt are given up on
+            abandoned = conn.execute(
+                "SELECT job_id, position, path FROM items "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, JOB_MAX_ATTEMPTS)
+            ).fetchall()
+            for job_id, position, path in abandoned:
+                self._finish(conn, job_id, position, path, "failed", None,
+                             f"Gave up after {JOB_MAX_ATTEMPTS} attempts", now)
+
+            items = conn.execute(
+                "SELECT job_id, position, filename, path, attempts + 1 FROM items "
+                "WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created, job_id, position LIMIT ?",
+                (now, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE items SET status = 'running', attempts = attempts + 1, lease_until = ? "
+                "WHERE job_id = ? AND position = ?",
+                [(now + JOB_LEASE_SECONDS, job_id, position) for job_id, position, *_ in items]
+            )
+        return [tuple(item) for item in items]
+
+    def _finish(self, conn, job_id: str, position: int, path: Optional[str],
+                status: str, result: Optional[Dict[str, Any]], error: Optional[str], now: float):
+        """Record a terminal state and drop the stored upload"""
+        conn.execute(
+            "UPDATE items SET status = ?, result = ?, error = ?, finished = ?, path = NULL, lease_until = NULL "
+            "WHERE job_id = ? AND position = ?",
+            (status, json.dumps(result) if result is not None else None, error, now, job_id, position)
+        )
+        if path:
+            try:
+                os.remove(path)
+                # Drops the job directory once its last upload is gone
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+    def complete(self, items: List[ClaimedItem], results: List[Dict[str, Any]]):
+        """Store per-image results (see bulk.format_result) for claimed images"""
+        now = time.time()
+        with self._transaction() as conn:
+            for (job_id, position, _, path, _), result in zip(items, results):
+                self._finish(conn, job_id, position, path, "done", result, None, now)
+
+    def fail(self, items: List[ClaimedItem], error: str):
+        """Requeue claimed images for a retry, or fail those out of attempts"""
+        now = time.time()
+        with self._transaction() as conn:
+            for job_id, position, _, path, attempts in items:
+                if attempts >= JOB_MAX_ATTEMPTS:
+                    self._finish(conn, job_id, position, path, "failed", None, error, now)
+                else:
+                    conn.execute(
+                        "UPDATE items SET status = 'queued', error = ?, lease_until = NULL "
+                        "WHERE job_id = ? AND position = ?",
+                        (error, job_id, position)
+                    )
+
+    def release(self, items: List[ClaimedItem]):
+        """Return claimed images to the queue without counting an attempt (shutdown)"""
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE items SET status = 'queued', attempts = attempts - 1, lease_until = NULL "
+                "WHERE job_id = ? AND position = ? AND status = 'running'",
+                [(job_id, position) for job_id, position, *_ in items]
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status, progress and finished results of one job"""
+        with self._lock:
+            job = self._conn.execute("SELECT created, total FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            items = self._conn.execute(
+                "SELECT filename, status, attempts, result, error, finished FROM items "
+                "WHERE job_id = ? ORDER BY position",
+                (job_id,)
+            ).fetchall()
+
+        counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+        results = []
+        for filename, status, attempts, result, error, _ in items:
+            counts[status] += 1
+            if status == "done":
+                results.append(json.loads(result))
+            elif status == "failed":
+                results.append({
+                    "filename": filename,
+                    "success": False,
+                    "error": f"Prediction failed after {attempts} attempt(s): {error}"
+                })
+
+        if counts["done"] + counts["failed"] == job[1]:
+            status = "done"
+        elif counts["queued"] == job[1]:
+            status = "queued"
+        else:
+            status = "running"
+        finished = [row[5] for row in items if row[5] is not None]
+        return {
+            "job_id": job_id,
+            "status": status,
+            "created": job[0],
+            "finished": max(finished) if status == "done" and finished else None,
+            "total": job[1],
+            "completed": counts["done"],
+            "failed": counts["failed"],
+            "pending": counts["queued"] + counts["running"],
+            "results": results
+        }
+
+    def counts(self) -> Dict[str, int]:
+        """Images per status across all jobs"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        return dict(rows)
+
+
+def _read_items(items: List[ClaimedItem]) -> List[bytes]:
+    """Load stored uploads for a claimed batch"""
+    contents = []
+    for _, _, _, path, _ in items:
+        with open(path, "rb") as fh:
+            contents.append(fh.read())
+    return contents
+
+
+class JobRunner:
+    """
+    Background tasks that drain the job store through the serving model
+
+    `current` returns the model being served (see main.ServingModel), or
+    None while it is still loading; each batch pins the version it ran on.
+    `interactive` returns the number of /predict requests in flight.
+    """
+
+    def __init__(self, store: JobStore, current: Callable[[], Any], conf: float, workers: int = JOB_WORKERS,
+                 interactive: Callable[[], int] = lambda: 0):
+        self.store = store
+        self.current = current
+        self.conf = conf
+        self.workers = max(0, workers)
+        self.interactive = interactive
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self):
+        """Start the drain workers"""
+        for _ in range(self.workers):
+            task = asyncio.ensure_future(self._drain())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def stop(self):
+        """Cancel the drain workers; their claimed images return to the queue"""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def _interactive_busy(self, current) -> bool:
+        """Whether /predict traffic is in flight, waiting, or would have to queue behind a job"""
+        return (self.interactive() > 0 or current.batcher.waiting > 0
+                or current.pool.pending >= current.pool.workers)
+
+    async def _drain(self):
+        while True:
+            current = self.current()
+            if current is None or self._interactive_busy(current):
+                await asyncio.sleep(JOB_POLL_SECONDS)
+                continue
+
+            items = await run_in_threadpool(self.store.claim, current.batcher.max_batch_size)
+            if not items:
+                await asyncio.sleep(JOB_POLL_SECONDS)
+                continue
+
+            current.users += 1
+            try:
+                contents = await run_in_threadpool(_read_items, items)
+                # Uploads may have arrived while claiming: they go first
+                while self._interactive_busy(current):
+                    await asyncio.sleep(JOB_POLL_SECONDS)
+                results = await current.pool.submit_with_backoff(detect_batch, contents, self.conf)
+                observe_batch(results)
+                await run_in_threadpool(self.store.complete, items, [
+                    format_result(item[2], result, current.version)
+                    for item, result in zip(items, results)
+                ])
+            except asyncio.CancelledError:
+                # Shielded so the claimed images are requeued even while cancelling
+                await asyncio.shield(run_in_threadpool(self.store.release, items))
+                raise
+            except Exception as e:
+                logger.error("❌ Error during job batch: %s", e)
+                await run_in_threadpool(self.store.fail, items, str(e))
+            finally:
+                current.users -= 1
@@ -3,14 +3,40 @@ YellowCert Backend API
 Medical certificate detection using YOLOv8
 """
 
-from fastapi import FastAPI, File, UploadFile
+import time
+
+# Reference point for cold-start measurements
+PROCESS_START = time.time()
+
+from fastapi import FastAPI, File, Header, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from ultralytics import YOLO
-import cv2
-import numpy as np
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import asyncio
+import hmac
+import logging
 import os
-from typing import List, Dict, Any
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from inference import INFERENCE_MODE, InferencePool, QueueFullError, RETRY_AFTER_SECONDS, WARMUP_PASSES, worker_input_size
+from batching import MicroBatcher
+from bulk import spool_uploads, stream_predictions
+from jobs import JobRunner, JobStore
+from pdf import PdfError, is_pdf, predict_pdf, shutdown_render_pool
+from cache import cache_key, create_result_cache, model_identity
+from dedup import create_near_duplicate_index
+from registry import ModelRegistry
+from ingest import INGEST_IMGSZ
+from tiling import TILE_MODE
+from metrics import CallbackCounter, Gauge, REQUEST_SECONDS, REQUESTS_TOTAL, STAGE_SECONDS, render as render_metrics
+
+# Leveled logging: LOG_LEVEL=WARNING keeps the hot path silent
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger("yellowcert")
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -31,14 +57,14 @@ def get_allowed_origins() -> List[str]:
     production_origin = os.getenv("FRONTEND_URL")
     if production_origin:
         origins.append(production_origin)
-        print(f"✅ Added production origin: {production_origin}")
+        logger.info("✅ Added production origin: %s", production_origin)
     else:
-        print("⚠️  Warning: FRONTEND_URL not set in environment variables")
+        logger.warning("⚠️  Warning: FRONTEND_URL not set in environment variables")
 
     return origins
 
 allowed_origins = get_allowed_origins()
-print(f"🔒 CORS allowed origins: {allowed_origins}")
+logger.info("🔒 CORS allowed origins: %s", allowed_origins)
 
 app.add_middleware(
     CORSMiddleware,
@@ -49,32 +75,273 @@ app.add_middleware(
 )
 
 # Model configuration
-MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "models", "best.pt")
-model = None
+# MODEL_BACKEND selects which artifact in models/ is served (see export_model.py)
+MODEL_ARTIFACTS = {
+    "pytorch": "best.pt",
+    "onnx": "best.onnx",
+    "openvino": "best_openvino_model",
+    "openvino-int8": "best_int8_openvino_model",
+}
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "pytorch")
+if MODEL_BACKEND not in MODEL_ARTIFACTS:
+    raise ValueError(f"Unknown MODEL_BACKEND '{MODEL_BACKEND}' (expected one of {sorted(MODEL_ARTIFACTS)})")
+# MODEL_PATH overrides the artifact location (e.g. for benchmarks)
+MODEL_PATH = os.getenv("MODEL_PATH") or os.path.join(
+    os.path.dirname(__file__), "..", "models", MODEL_ARTIFACTS[MODEL_BACKEND]
+)
+result_cache = None
+near_dup_index = None
+in_flight = 0
+model_registry = ModelRegistry()
+
+# Poll the registry's active version / MODEL_PATH mtime and hot-swap on change (0 = off)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+# Token required by /admin endpoints; admin API is disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+@dataclass
+class ServingModel:
+    """Everything tied to one loaded model version, swapped as a single unit"""
+    version: str
+    path: str
+    identity: str
+    imgsz: int
+    pool: InferencePool
+    batcher: MicroBatcher
+    users: int = 0
+    load_seconds: float = 0.0
+    warmup_seconds: float = 0.0
+
+# Currently served model; requests grab this reference once and keep it
+serving: Optional[ServingModel] = None
+swap_lock = asyncio.Lock()
+
+# Pretrained checkpoint used when MODEL_PATH is missing; empty = fail instead
+MODEL_FALLBACK = os.getenv("MODEL_FALLBACK", "yolov8n.pt")
+
+# Minimum confidence for returned detections
+CONFIDENCE_THRESHOLD = 0.1
+
+# Background loading state, reported by /ready
+startup: Dict[str, Any] = {
+    "ready": False,
+    "error": None,
+    "model_path": None,
+    "fallback": False,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "ready_after_seconds": None,
+    "first_request_ms": None,
+    # Timings of the latest hot swap; the keys above stay the cold-start numbers
+    "last_swap": None,
+}
+loader_task = None
+watcher_task = None
+job_store: Optional[JobStore] = None
+job_runner: Optional[JobRunner] = None
+
+def resolve_model_path() -> str:
+    """Path of the configured artifact, or the pretrained fallback if missing"""
+    if os.path.exists(MODEL_PATH):
+        return MODEL_PATH
+
+    if not MODEL_FALLBACK:
+        raise FileNotFoundError(f"Model not found at {MODEL_PATH} and MODEL_FALLBACK is disabled")
+
+    logger.warning("⚠️  Warning: Custom model not found at %s", MODEL_PATH)
+    logger.warning("⚠️  Using pretrained %s model as fallback", MODEL_FALLBACK)
+    startup["fallback"] = True
+    return MODEL_FALLBACK
+
+def model_version_label(model_path: str) -> str:
+    """Version label for an unversioned artifact: file name plus modification time"""
+    name = os.path.basename(os.path.normpath(model_path))
+    if not os.path.exists(model_path):
+        return name
+    return f"{name}@{time.strftime('%Y%m%d-%H%M%S', time.localtime(os.path.getmtime(model_path)))}"
 
-# Class names (from data.yaml)
-CLASS_NAMES = [
-    'cholera', 'covid', 'date', 'flu',
-    'logo', 'meningo', 'signature', 'yellowfever'
-]
+def resolve_model_target() -> Tuple[str, str]:
+    """(path, version) to serve: the registry's active version, else MODEL_PATH"""
+    active = model_registry.active_version()
+    if active:
+        return model_registry.path_for(active), active
+
+    model_path = resolve_model_path()
+    return model_path, model_version_label(model_path)
+
+async def build_serving_model(model_path: str, version: str) -> ServingModel:
+    """Load a model, start its worker pool and warm it up, without serving it yet"""
+    start = time.perf_counter()
+    pool = InferencePool(model_path)
+    logger.info("✅ Inference pool ready: %d %s worker(s), capacity %d",
+                pool.workers, pool.mode, pool.capacity)
+
+    # Only the workers hold the model; the first one to load it reports the input size
+    try:
+        imgsz = await pool.submit(worker_input_size)
+    except Exception:
+        pool.shutdown()
+        raise
+    load_seconds = round(time.perf_counter() - start, 3)
+    logger.info("✅ Model %s loaded successfully from %s (imgsz=%d)", version, model_path, imgsz)
+
+    # Process workers cannot reach the index, which lives in this process
+    identity = model_identity(model_path)
+    near_dup = near_dup_index if pool.mode == "thread" else None
+    batcher = MicroBatcher(pool, CONFIDENCE_THRESHOLD, near_dup=near_dup,
+                           scope=f"{identity}|conf={CONFIDENCE_THRESHOLD}|tile={TILE_MODE}|imgsz={INGEST_IMGSZ}")
+    logger.info("✅ Micro-batching: up to %d image(s), max wait %.0f ms",
+                batcher.max_batch_size, batcher.max_wait * 1000)
+
+    # Load every worker's model and run warm-up passes at the serving size
+    start = time.perf_counter()
+    try:
+        await pool.warm_up(WARMUP_PASSES, batcher.max_batch_size)
+    except Exception:
+        pool.shutdown()
+        raise
+    warmup_seconds = round(time.perf_counter() - start, 3)
+    logger.info("✅ Warm-up: %d pass(es) per worker in %.2fs", WARMUP_PASSES, warmup_seconds)
+
+    return ServingModel(
+        version=version,
+        path=model_path,
+        identity=identity,
+        imgsz=imgsz,
+        pool=pool,
+        batcher=batcher,
+        load_seconds=load_seconds,
+        warmup_seconds=warmup_seconds
+    )
 
 @app.on_event("startup")
+async def start_model_loading():
+    """Start loading the model in the background so the port binds immediately"""
+    global loader_task, watcher_task, job_store, job_runner
+    loader_task = asyncio.create_task(load_model())
+    if MODEL_WATCH_INTERVAL > 0:
+        watcher_task = asyncio.create_task(watch_model())
+
+    # Jobs are accepted right away and drained once the model is ready
+    job_store = await run_in_threadpool(JobStore)
+    job_runner = JobRunner(job_store, lambda: serving if startup["ready"] else None, CONFIDENCE_THRESHOLD,
+                           interactive=lambda: in_flight)
+    job_runner.start()
+
 async def load_model():
-    """Load YOLOv8 model on startup"""
-    global model
+    """Load YOLOv8 model, warm up the workers and mark the app ready"""
+    global serving, result_cache, near_dup_index
 
     try:
-        print(f"🔄 Loading model from {MODEL_PATH}...")
-        if os.path.exists(MODEL_PATH):
-            model = YOLO(MODEL_PATH)
-            print(f"✅ Model loaded successfully from {MODEL_PATH}")
-        else:
-            print(f"⚠️  Warning: Custom model not found at {MODEL_PATH}")
-            print(f"⚠️  Using pretrained YOLOv8n model as fallback")
-            model = YOLO('yolov8n.pt')
+        # The index is handed to the batcher, so it must exist before the model is served
+        near_dup_index = await run_in_threadpool(create_near_duplicate_index)
+        if near_dup_index is not None:
+            logger.info("✅ Near-duplicate index: %s, distance <= %d, %d entries loaded",
+                        near_dup_index.backend, near_dup_index.max_distance, len(near_dup_index))
+            if INFERENCE_MODE != "thread":
+                logger.warning("⚠️ Near-duplicate reuse needs INFERENCE_MODE=thread; disabled")
+
+        logger.info("🔄 Loading %s model from %s...", MODEL_BACKEND, MODEL_PATH)
+        model_path, version = resolve_model_target()
+        async with swap_lock:
+            serving = await build_serving_model(model_path, version)
+        startup["model_path"] = model_path
+        startup["load_seconds"] = serving.load_seconds
+        startup["warmup_seconds"] = serving.warmup_seconds
+
+        result_cache = create_result_cache()
+        if result_cache is not None:
+            logger.info("✅ Result cache: %s, up to %d entries", result_cache.backend, result_cache.max_entries)
+
+        startup["ready_after_seconds"] = round(time.time() - PROCESS_START, 3)
+        startup["ready"] = True
+        logger.info("🚀 Ready %.2fs after start", startup["ready_after_seconds"])
     except Exception as e:
-        print(f"❌ Error loading model: {e}")
-        raise
+        startup["error"] = str(e)
+        logger.error("❌ Error loading model: %s", e)
+
+async def swap_model(model_path: str, version: str) -> ServingModel:
+    """
+    Load and warm up a new model version next to the current one, then
+    switch to it. Requests already running keep the old version until
+    they finish; its workers are released afterwards.
+    """
+    global serving
+
+    async with swap_lock:
+        logger.info("🔄 Loading model version %s from %s...", version, model_path)
+        replacement = await build_serving_model(model_path, version)
+
+        # A single reference assignment: new requests see either version, never a mix
+        retired, serving = serving, replacement
+        startup["model_path"] = model_path
+        startup["last_swap"] = {
+            "version": version,
+            "at": time.time(),
+            "load_seconds": replacement.load_seconds,
+            "warmup_seconds": replacement.warmup_seconds,
+        }
+        logger.info("✅ Now serving model version %s", version)
+
+    if retired is not None:
+        asyncio.create_task(retire_model(retired))
+    return replacement
+
+async def retire_model(old: ServingModel):
+    """Release a swapped-out model once its in-flight work has drained"""
+    while old.users > 0 or old.batcher.waiting > 0 or old.pool.pending > 0:
+        await asyncio.sleep(0.1)
+    old.pool.shutdown()
+    logger.info("🗑️  Released model version %s", old.version)
+
+async def watch_model():
+    """Hot-swap when the registry's active version or the model file changes"""
+    failed_identity = None
+    while True:
+        await asyncio.sleep(MODEL_WATCH_INTERVAL)
+        if serving is None:
+            continue
+        identity = None
+        try:
+            active = model_registry.active_version()
+            if active:
+                model_path, version = model_registry.path_for(active), active
+            elif os.path.exists(MODEL_PATH):
+                model_path, version = MODEL_PATH, model_version_label(MODEL_PATH)
+            else:
+                continue
+
+            identity = model_identity(model_path)
+            if identity in (serving.identity, failed_identity):
+                continue
+            await swap_model(model_path, version)
+        except Exception as e:
+            failed_identity = identity
+            logger.error("❌ Model swap failed, still serving %s: %s", serving.version, e)
+
+@app.on_event("shutdown")
+async def shutdown_pool():
+    """Release inference workers on shutdown"""
+    for task in (loader_task, watcher_task):
+        if task is not None and not task.done():
+            task.cancel()
+    if job_runner is not None:
+        job_runner.stop()
+    if serving is not None:
+        serving.pool.shutdown()
+    shutdown_render_pool()
+
+def not_ready_response() -> JSONResponse:
+    """503 returned while the model is still loading (or failed to load)"""
+    error = startup["error"]
+    return JSONResponse(
+        status_code=503,
+        headers={} if error else {"Retry-After": str(RETRY_AFTER_SECONDS)},
+        content={
+            "success": False,
+            "error": f"Model failed to load: {error}" if error else "Model is still loading. Please try again shortly."
+        }
+    )
 
 @app.get("/")
 async def root():
@@ -83,31 +350,21 @@ async def root():
         "message": "YellowCert Detection API",
         "status": "running",
         "version": "1.0.0",
-        "model_loaded": model is not None
+        "model_loaded": serving is not None,
+        "ready": startup["ready"],
+        "model_backend": MODEL_BACKEND,
+        "model_version": serving.version if serving is not None else None,
+        "cache": result_cache.stats() if result_cache is not None else None,
+        "near_duplicates": near_dup_index.stats() if near_dup_index is not None else None
     }
 
-def process_detection(box, class_names: List[str]) -> Dict[str, Any]:
-    """Process a single detection box"""
-    # Get box coordinates (xyxy format)
-    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-
-    # Get class and confidence
-    cls = int(box.cls[0].cpu().numpy())
-    conf = float(box.conf[0].cpu().numpy())
-
-    # Get class name
-    class_name = class_names[cls] if cls < len(class_names) else f"class_{cls}"
-
-    return {
-        "class": class_name,
-        "confidence": round(conf, 2),
-        "bbox": {
-            "x1": float(x1),
-            "y1": float(y1),
-            "x2": float(x2),
-            "y2": float(y2)
-        }
-    }
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the model is loaded and warmed up"""
+    return JSONResponse(
+        status_code=200 if startup["ready"] else 503,
+        content=startup
+    )
 
 @app.post("/predict")
 async def predict(file: UploadFile = File(...)):
@@ -115,18 +372,64 @@ async def predict(file: UploadFile = File(...)):
     Detect medical certificate elements in uploaded image
 
     Args:
-        file: Image file (JPG, PNG, etc.)
+        file: Image file (JPG, PNG, etc.) or a PDF
 
     Returns:
-        JSON with detections, bounding boxes, and confidence scores
+        JSON with detections, bounding boxes, and confidence scores;
+        for a PDF, one such detection list per page under "pages"
     """
+    global in_flight
+
+    if not startup["ready"]:
+        return not_ready_response()
+
+    # Pin the current model version for the whole request
+    current = serving
+    current.users += 1
+    in_flight += 1
+    start = time.perf_counter()
     try:
-        # Read and decode image
+        response = await run_prediction(file, current)
+    finally:
+        in_flight -= 1
+        current.users -= 1
+
+    elapsed = time.perf_counter() - start
+    if startup["first_request_ms"] is None:
+        startup["first_request_ms"] = round(elapsed * 1000, 1)
+        logger.info("⏱️  First request served in %.1f ms", elapsed * 1000)
+    REQUEST_SECONDS.observe(elapsed)
+    REQUESTS_TOTAL.inc(str(response.status_code))
+    logger.debug("/predict %s -> %d in %.1f ms", file.filename, response.status_code, elapsed * 1000)
+    return response
+
+async def run_prediction(file: UploadFile, current: ServingModel) -> JSONResponse:
+    """Run one /predict request against a pinned model version, timing each stage"""
+    try:
+        # Read upload; repeated uploads are served from the result cache
+        start = time.perf_counter()
         contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        STAGE_SECONDS.observe(time.perf_counter() - start, "read")
+
+        key = None
+        result = None
+        if result_cache is not None:
+            # Hashing large uploads and SQLite lookups would stall the event loop
+            key = await run_in_threadpool(cache_key, contents, CONFIDENCE_THRESHOLD, current.identity)
+            result = await run_in_threadpool(result_cache.get, key)
 
-        if img is None:
+        # Otherwise decode and infer in a shared batch; PDF pages form their own batches
+        if result is None:
+            if is_pdf(contents):
+                pages = await predict_pdf(contents, current.pool, CONFIDENCE_THRESHOLD,
+                                          current.imgsz, current.batcher.max_batch_size)
+                result = {"pages": pages}
+            else:
+                result = await predict_image(contents, current)
+            if result is not None and key is not None:
+                await run_in_threadpool(result_cache.set, key, result)
+
+        if result is None:
             return JSONResponse(
                 status_code=400,
                 content={
@@ -135,34 +438,54 @@ async def predict(file: UploadFile = File(...)):
                 }
             )
 
-        # Get image dimensions
-        height, width = img.shape[:2]
-
-        # Run inference
-        results = model(img, conf=0.1)
-
-        # Process detections
-        detections = []
-        for result in results:
-            boxes = result.boxes
-            print(f"✓ Detected {len(boxes)} objects")
-
-            for box in boxes:
-                detection = process_detection(box, CLASS_NAMES)
-                detections.append(detection)
-
-        return {
-            "success": True,
-            "detections": detections,
-            "count": len(detections),
-            "image_size": {
-                "width": width,
-                "height": height
+        start = time.perf_counter()
+        if "pages" in result:
+            response = JSONResponse(content={
+                "success": True,
+                "pages": [
+                    {
+                        "page": page["page"],
+                        "detections": page["detections"],
+                        "count": len(page["detections"]),
+                        "image_size": page["image_size"]
+                    }
+                    for page in result["pages"]
+                ],
+                "page_count": len(result["pages"]),
+                "model_version": current.version
+            })
+        else:
+            response = JSONResponse(content={
+                "success": True,
+                "detections": result["detections"],
+                "count": len(result["detections"]),
+                "image_size": result["image_size"],
+                "model_version": current.version
+            })
+        STAGE_SECONDS.observe(time.perf_counter() - start, "serialize")
+        return response
+
+    except PdfError as e:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "success": False,
+                "error": str(e)
             }
-        }
+        )
+
+    except QueueFullError:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            content={
+                "success": False,
+                "error": "Server is busy. Please try again shortly."
+            }
+        )
 
     except Exception as e:
-        print(f"❌ Error during prediction: {e}")
+        logger.exception("❌ Error during prediction: %s", e)
         return JSONResponse(
             status_code=500,
             content={
@@ -171,6 +494,164 @@ async def predict(file: UploadFile = File(...)):
             }
         )
 
+async def predict_image(contents: bytes, current: ServingModel) -> Optional[Dict[str, Any]]:
+    """
+    Infer in a shared batch; near-duplicates of indexed uploads are
+    answered by the workers from the index, without a forward pass
+    """
+    return await current.batcher.submit(contents)
+
+@app.post("/predict/batch")
+async def predict_batch(files: List[UploadFile] = File(...)):
+    """
+    Detect certificate elements in many images at once
+
+    Args:
+        files: Image files and/or ZIP archives of images
+
+    Returns:
+        NDJSON stream with one /predict-style result per image, each tagged
+        with its filename, emitted as soon as its batch finishes
+    """
+    if not startup["ready"]:
+        return not_ready_response()
+
+    current = serving
+    if current.pool.pending >= current.pool.capacity:
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            content={
+                "success": False,
+                "error": "Server is busy. Please try again shortly."
+            }
+        )
+
+    spooled = await spool_uploads(files)
+    stream = stream_predictions(spooled, current.pool, CONFIDENCE_THRESHOLD,
+                                current.batcher.max_batch_size, current.version)
+    return StreamingResponse(pinned_stream(current, stream), media_type="application/x-ndjson")
+
+async def pinned_stream(current: ServingModel, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Keep a model version alive until a streaming response completes"""
+    current.users += 1
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        current.users -= 1
+
+@app.post("/jobs")
+async def create_job(files: List[UploadFile] = File(...)):
+    """
+    Queue images and/or ZIP archives for background processing
+
+    Returns:
+        JSON with the job id; poll GET /jobs/{job_id} for progress and results
+    """
+    job_id = await run_in_threadpool(job_store.create, [(upload.filename or "upload", upload.file) for upload in files])
+    if job_id is None:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": "No files found in the upload."}
+        )
+    return JSONResponse(status_code=202, content={"success": True, "job_id": job_id})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a background job, with /predict/batch-style results for finished images"""
+    job = await run_in_threadpool(job_store.get, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"success": False, "error": f"Unknown job '{job_id}'"})
+    return {"success": True, **job}
+
+def admin_denied(token: str) -> Optional[JSONResponse]:
+    """403 unless ADMIN_TOKEN is configured and matches"""
+    if ADMIN_TOKEN and hmac.compare_digest(token, ADMIN_TOKEN):
+        return None
+    return JSONResponse(
+        status_code=403,
+        content={"success": False, "error": "Admin API disabled or invalid token"}
+    )
+
+@app.get("/admin/models")
+async def list_models(x_admin_token: str = Header("")):
+    """List registered model versions and the one being served"""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    return {
+        "serving": serving.version if serving is not None else None,
+        "active": model_registry.active_version(),
+        "versions": model_registry.versions()
+    }
+
+@app.post("/admin/models/{version}/activate")
+async def activate_model(version: str, x_admin_token: str = Header("")):
+    """Load, warm up and switch to a registered model version without downtime"""
+    denied = admin_denied(x_admin_token)
+    if denied:
+        return denied
+    if not startup["ready"]:
+        return not_ready_response()
+
+    try:
+        model_path = model_registry.path_for(version)
+    except KeyError as e:
+        return JSONResponse(status_code=404, content={"success": False, "error": str(e)})
+
+    try:
+        await swap_model(model_path, version)
+    except Exception as e:
+        logger.error("❌ Model swap failed, still serving %s: %s", serving.version, e)
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": f"Model swap failed: {str(e)}"}
+        )
+
+    # Persist so restarts and other workers (via MODEL_WATCH_INTERVAL) follow
+    model_registry.set_active(version)
+    return {"success": True, "model_version": version}
+
+# Gauges read live server state at scrape time
+Gauge(
+    "yellowcert_queue_depth", "Uploads waiting to be batched and batches waiting for a worker",
+    labels=("queue",),
+    callback=lambda: {
+        ("batcher",): serving.batcher.waiting if serving is not None else 0,
+        ("pool",): serving.pool.pending if serving is not None else 0,
+    }
+)
+Gauge("yellowcert_in_flight_requests", "/predict requests currently being handled",
+      callback=lambda: {(): in_flight})
+Gauge(
+    "yellowcert_model_info", "Loaded model identity (always 1)",
+    labels=("backend", "version", "identity"),
+    callback=lambda: {(MODEL_BACKEND, serving.version, serving.identity): 1} if serving is not None else {}
+)
+Gauge(
+    "yellowcert_job_items", "Background job images by status",
+    labels=("status",),
+    callback=lambda: {(status,): count for status, count in job_store.counts().items()} if job_store else {}
+)
+CallbackCounter(
+    "yellowcert_cache_lookups_total", "Result cache lookups by outcome",
+    labels=("result",),
+    callback=lambda: {("hit",): result_cache.hits, ("miss",): result_cache.misses} if result_cache else {}
+)
+
+CallbackCounter(
+    "yellowcert_near_duplicate_lookups_total", "Near-duplicate index lookups by outcome",
+    labels=("result",),
+    callback=lambda: {("hit",): near_dup_index.hits, ("miss",): near_dup_index.misses} if near_dup_index else {}
+)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (per worker process)"""
+    # Gauge callbacks may query SQLite (job counts), so render off the event loop
+    return PlainTextResponse(await run_in_threadpool(render_metrics), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
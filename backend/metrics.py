@@ -0,0 +1,146 @@
+"""
+YellowCert metrics
+Minimal Prometheus-style histograms, counters and gauges for /metrics
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from fast decodes to slow CPU inference
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class: name, help text and label names"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """Gauge whose value is read from a callback at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        values = self.callback() if self.callback is not None else {}
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in values.items()]
+
+
+class CallbackCounter(Gauge):
+    """Counter whose value is maintained elsewhere and read at scrape time"""
+
+    kind = "counter"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            counts = self._counts.setdefault(label_values, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[label_values] = self._sums.get(label_values, 0.0) + value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), self._counts[key]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    bucket_label = 'le="' + le + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, bucket_label)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {self._sums[key]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[Metric] = []
+
+# /predict metrics
+STAGE_SECONDS = Histogram(
+    "yellowcert_stage_seconds",
+    "Time spent in each /predict stage (read, decode, inference, postprocess, serialize)",
+    labels=("stage",)
+)
+REQUEST_SECONDS = Histogram("yellowcert_request_seconds", "End-to-end /predict handler time")
+BATCH_SIZE = Histogram("yellowcert_batch_size", "Images per inference batch", buckets=BATCH_BUCKETS)
+REQUESTS_TOTAL = Counter("yellowcert_requests_total", "/predict responses by status code", labels=("status",))
+
+
+def observe_batch(results: List[Optional[dict]]):
+    """Record worker-side stage timings and strip them from the results"""
+    timed = [result for result in results if result is not None and "timings" in result]
+    if timed:
+        BATCH_SIZE.observe(len(timed))
+        # Inference is one forward pass for the whole batch
+        STAGE_SECONDS.observe(timed[0]["timings"]["inference"], "inference")
+    for result in timed:
+        timings = result.pop("timings")
+        STAGE_SECONDS.observe(timings["decode"], "decode")
+        STAGE_SECONDS.observe(timings["postprocess"], "postprocess")
+
+
+def render() -> str:
+    """Text exposition format for every registered metric"""
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,155 @@
+"""
+YellowCert PDF ingestion
+Page-parallel rasterization of multi-page PDF certificates
+
+pdfium is not thread-safe, so pages are rendered in a small pool of
+worker processes, each opening the document from a temp file. Pages are
+rendered one batch ahead of inference: while the model runs on batch k,
+the render workers are already producing batch k + 1, and at most two
+batches of page bitmaps are held at a time however long the PDF is.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from inference import InferencePool, detect_pages
+from metrics import observe_batch
+
+# Rasterization processes (default: min(4, CPU cores))
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Render resolution; 0 = fit each page's long side to the model input size
+PDF_DPI = float(os.getenv("PDF_DPI", "0"))
+# PDFs with more pages than this are rejected
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+
+PDF_MAGIC = b"%PDF-"
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+class PdfError(ValueError):
+    """Raised for PDFs that cannot be rasterized or exceed PDF_MAX_PAGES"""
+
+
+def is_pdf(contents: bytes) -> bool:
+    """Whether an upload is a PDF (the header may follow a few junk bytes)"""
+    return PDF_MAGIC in contents[:1024]
+
+
+def count_pages(path: str) -> Optional[int]:
+    """Number of pages, or None if the file is not a readable PDF (runs in a render worker)"""
+    import pypdfium2 as pdfium
+
+    try:
+        doc = pdfium.PdfDocument(path)
+    except pdfium.PdfiumError:
+        return None
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def render_page(path: str, index: int, imgsz: int, dpi: float = PDF_DPI):
+    """Render one page to a BGR array (runs in a render worker)"""
+    import pypdfium2 as pdfium
+
+    doc = pdfium.PdfDocument(path)
+    try:
+        page = doc[index]
+        if dpi > 0:
+            scale = dpi / 72
+        else:
+            scale = imgsz / max(page.get_size())
+        # pdfium renders BGR natively, which is what cv2 and Ultralytics expect
+        bitmap = page.render(scale=scale)
+        return bitmap.to_numpy().copy()
+    finally:
+        doc.close()
+
+
+def render_executor() -> ProcessPoolExecutor:
+    """Shared render pool, started on first use (after any pre-fork)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=max(1, PDF_RENDER_WORKERS),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_render_pool():
+    """Release the render workers"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _write_temp(contents: bytes) -> str:
+    """Write the PDF where the render workers can open it"""
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(contents)
+    return path
+
+
+async def predict_pdf(
+    contents: bytes,
+    pool: InferencePool,
+    conf: float,
+    imgsz: int,
+    batch_size: int
+) -> List[Dict[str, Any]]:
+    """
+    Rasterize a PDF and run its pages through the model batch by batch
+
+    Returns one /predict-style result per page, in page order. Raises
+    PdfError for unreadable or oversized PDFs, and QueueFullError if the
+    pool is saturated before the first batch starts; later batches wait
+    for a slot so finished pages aren't thrown away.
+    """
+    path = await run_in_threadpool(_write_temp, contents)
+    loop = asyncio.get_running_loop()
+    executor = render_executor()
+    pending: List[asyncio.Future] = []
+    try:
+        count = await loop.run_in_executor(executor, count_pages, path)
+        if not count:
+            raise PdfError("Invalid PDF file. Please upload a valid PDF.")
+        if count > PDF_MAX_PAGES:
+            raise PdfError(f"PDF has {count} pages; at most {PDF_MAX_PAGES} are accepted.")
+
+        batch_size = max(1, batch_size)
+        windows = [range(i, min(i + batch_size, count)) for i in range(0, count, batch_size)]
+
+        def start_rendering(window: range) -> List[asyncio.Future]:
+            return [loop.run_in_executor(executor, render_page, path, index, imgsz) for index in window]
+
+        results: List[Dict[str, Any]] = []
+        pending = start_rendering(windows[0])
+        for position, window in enumerate(windows):
+            pages = await asyncio.gather(*pending)
+            # Render the next batch while this one is being inferred
+            pending = start_rendering(windows[position + 1]) if position + 1 < len(windows) else []
+
+            submit = pool.submit if position == 0 else pool.submit_with_backoff
+            batch = await submit(detect_pages, pages, conf)
+            observe_batch(batch)
+            del pages
+
+            for index, result in zip(window, batch):
+                result["page"] = index + 1
+                results.append(result)
+        return results
+    finally:
+        for future in pending:
+            future.cancel()
+        os.unlink(path)
@@ -0,0 +1,74 @@
+"""
+YellowCert process statistics
+Resident/shared memory figures for serving processes
+"""
+
+import glob
+import os
+import resource
+import sys
+from typing import Dict, List, Optional
+
+# smaps_rollup fields reported, converted from kB to MB
+SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Memory of a process in MB
+
+    On Linux this reads /proc/<pid>/smaps_rollup, where PSS divides shared
+    pages between the processes mapping them, so summing pss_mb across
+    forked workers gives their real combined footprint. Elsewhere only
+    the peak RSS of the current process is available.
+    """
+    path = f"/proc/{pid or 'self'}/smaps_rollup"
+    if os.path.exists(path):
+        stats = {}
+        try:
+            with open(path) as fh:
+                for line in fh:
+                    key, _, value = line.partition(":")
+                    if key in SMAPS_FIELDS:
+                        stats[SMAPS_FIELDS[key]] = round(int(value.split()[0]) / 1024, 1)
+        except OSError:
+            # Process exited while being read
+            return {}
+        return stats
+
+    if pid not in (None, os.getpid()):
+        return {}
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {"peak_rss_mb": round(peak / scale, 1)}
+
+
+def process_tree(pid: int) -> List[int]:
+    """pid plus all of its descendants (Linux only; just pid elsewhere)"""
+    pids = [pid]
+    for current in pids:
+        for children in glob.glob(f"/proc/{current}/task/*/children"):
+            try:
+                with open(children) as fh:
+                    pids.extend(int(child) for child in fh.read().split())
+            except OSError:
+                continue
+    return pids
+
+
+def process_tree_memory(pid: int) -> Dict[str, float]:
+    """Summed RSS and PSS in MB of a process and its descendants"""
+    totals = {"rss_mb": 0.0, "pss_mb": 0.0}
+    for member in process_tree(pid):
+        mem = process_memory(member)
+        totals["rss_mb"] += mem.get("rss_mb", 0.0)
+        totals["pss_mb"] += mem.get("pss_mb", 0.0)
+    return totals
@@ -0,0 +1,168 @@
+"""
+YellowCert model registry
+Versioned model artifacts under models/registry/ with an active pointer
+
+Layout:
+    models/registry/
+        ACTIVE              # name of the version being served
+        v1/meta.json        # version, artifact, source, sha256, created, notes
+        v1/best.pt
+        v2/meta.json
+        v2/best_max.pt
+
+Usage (from the project root):
+    python backend/registry.py register models/best.pt --notes "baseline"
+    python backend/registry.py register models/best_max.pt --activate
+    python backend/registry.py list
+    python backend/registry.py activate v1
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional
+
+REGISTRY_DIR = os.getenv(
+    "MODEL_REGISTRY_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "models", "registry")
+)
+ACTIVE_FILE = "ACTIVE"
+META_FILE = "meta.json"
+
+
+def file_sha256(path: str) -> Optional[str]:
+    """SHA-256 of a file artifact (None for directory artifacts)"""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Versioned model store; every version is an immutable directory"""
+
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = os.path.abspath(root)
+
+    def versions(self) -> List[Dict[str, Any]]:
+        """Metadata for every registered version, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        metas = [self.get(name) for name in os.listdir(self.root)]
+        return sorted((meta for meta in metas if meta), key=lambda meta: meta["created"])
+
+    def get(self, version: str) -> Optional[Dict[str, Any]]:
+        """Metadata for one version, or None if it does not exist"""
+        meta_path = os.path.join(self.root, version, META_FILE)
+        if not os.path.isfile(meta_path):
+            return None
+        with open(meta_path) as fh:
+            return json.load(fh)
+
+    def path_for(self, version: str) -> str:
+        """Path of the artifact stored for a version"""
+        meta = self.get(version)
+        if meta is None:
+            raise KeyError(f"Unknown model version '{version}'")
+        return os.path.join(self.root, version, meta["artifact"])
+
+    def active_version(self) -> Optional[str]:
+        """Version currently marked active, if any"""
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as fh:
+                version = fh.read().strip()
+        except FileNotFoundError:
+            return None
+        return version if self.get(version) else None
+
+    def set_active(self, version: str):
+        """Point ACTIVE at a version (atomic rename, safe for watchers)"""
+        if self.get(version) is None:
+            raise KeyError(f"Unknown model version '{version}'")
+        tmp_path = os.path.join(self.root, f".{ACTIVE_FILE}.tmp")
+        with open(tmp_path, "w") as fh:
+            fh.write(version + "\n")
+        os.replace(tmp_path, os.path.join(self.root, ACTIVE_FILE))
+
+    def next_version(self) -> str:
+        numbers = [int(meta["version"][1:]) for meta in self.versions()
+                   if meta["version"].startswith("v") and meta["version"][1:].isdigit()]
+        return f"v{max(numbers, default=0) + 1}"
+
+    def register(self, source: str, version: Optional[str] = None, notes: str = "") -> Dict[str, Any]:
+        """Copy an artifact (file or exported model directory) into a new version"""
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Artifact not found: {source}")
+
+        version = version or self.next_version()
+        target_dir = os.path.join(self.root, version)
+        if os.path.exists(target_dir):
+            raise FileExistsError(f"Model version '{version}' already exists")
+
+        # Stage first so a half-copied version is never visible
+        staging_dir = os.path.join(self.root, f".{version}.staging")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+        artifact = os.path.basename(os.path.normpath(source))
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(staging_dir, artifact))
+        else:
+            shutil.copy2(source, os.path.join(staging_dir, artifact))
+
+        meta = {
+            "version": version,
+            "artifact": artifact,
+            "source": os.path.abspath(source),
+            "sha256": file_sha256(source),
+            "created": time.time(),
+            "notes": notes,
+        }
+        with open(os.path.join(staging_dir, META_FILE), "w") as fh:
+            json.dump(meta, fh, indent=2)
+        os.rename(staging_dir, target_dir)
+        return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage YellowCert model versions")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    register = sub.add_parser("register", help="Add a model artifact as a new version")
+    register.add_argument("artifact", help="e.g. models/best.pt or models/best_openvino_model")
+    register.add_argument("--version", help="Version name (default: next vN)")
+    register.add_argument("--notes", default="")
+    register.add_argument("--activate", action="store_true", help="Mark the new version active")
+
+    sub.add_parser("list", help="List registered versions")
+
+    activate = sub.add_parser("activate", help="Mark a version active")
+    activate.add_argument("version")
+
+    args = parser.parse_args()
+    registry = ModelRegistry()
+
+    if args.command == "register":
+        meta = registry.register(args.artifact, args.version, args.notes)
+        print(f"✅ Registered {meta['artifact']} as {meta['version']}")
+        if args.activate:
+            registry.set_active(meta["version"])
+            print(f"✅ {meta['version']} is now active")
+    elif args.command == "activate":
+        registry.set_active(args.version)
+        print(f"✅ {args.version} is now active")
+    else:
+        active = registry.active_version()
+        for meta in registry.versions():
+            marker = "*" if meta["version"] == active else " "
+            created = time.strftime("%Y-%m-%d %H:%M", time.localtime(meta["created"]))
+            print(f"{marker} {meta['version']:<8} {meta['artifact']:<28} {created}  {meta['notes']}")
+
+
+if __name__ == "__main__":
+    main()
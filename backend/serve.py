@@ -0,0 +1,163 @@
+"""
+YellowCert pre-fork server
+Loads the model once, then forks uvicorn workers that share its weights
+
+The parent process loads and warms up the configured model, binds the
+listening socket and forks --workers children. Each child serves the
+regular FastAPI app on the shared socket with a single inference thread
+that adopts the inherited model, so weight pages stay shared
+copy-on-write instead of being duplicated per worker. Per-worker thread
+counts are pinned so workers don't oversubscribe the cores, and the
+parent periodically reports RSS/PSS per worker.
+
+Linux/macOS only (relies on fork).
+
+Usage:
+    cd backend && python serve.py --workers 4 --port $PORT
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the YellowCert API with pre-forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", "0")),
+                        help="Worker processes (default: one per CPU core)")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SERVE_THREADS", "0")),
+                        help="Compute threads per worker (default: cores / workers)")
+    parser.add_argument("--report-interval", type=float, default=60.0,
+                        help="Seconds between memory reports (0 = only at startup)")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+
+def report_memory(children, process_memory):
+    """Print RSS/PSS for the parent and every worker"""
+    print(f"{'process':<14} {'pid':>7} {'rss MB':>9} {'pss MB':>9} {'shared MB':>10} {'private MB':>11}")
+    rows = [("parent", os.getpid())] + [(f"worker {index}", pid) for pid, index in sorted(children.items(), key=lambda c: c[1])]
+    total_pss = 0.0
+    for name, pid in rows:
+        mem = process_memory(pid)
+        shared = mem.get("shared_clean_mb", 0) + mem.get("shared_dirty_mb", 0)
+        private = mem.get("private_clean_mb", 0) + mem.get("private_dirty_mb", 0)
+        total_pss += mem.get("pss_mb", 0)
+        print(f"{name:<14} {pid:>7} {mem.get('rss_mb', 0):>9.1f} {mem.get('pss_mb', 0):>9.1f} "
+              f"{shared:>10.1f} {private:>11.1f}")
+    print(f"📊 Total PSS (real combined footprint): {total_pss:.1f} MB")
+
+
+def run_worker(app, sock, threads: int, log_level: str):
+    """Child process: serve the app on the inherited socket"""
+    import cv2
+    import torch
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def main():
+    args = parse_args()
+    cores = os.cpu_count() or 1
+    workers = args.workers if args.workers > 0 else cores
+    threads = args.threads if args.threads > 0 else max(1, cores // workers)
+
+    # Must be set before torch/OpenCV/the app are imported
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["INFERENCE_MODE"] = "thread"
+    os.environ.setdefault("INFERENCE_WORKERS", "1")
+
+    import cv2
+    import torch
+
+    import main as api
+    from inference import preload_model
+    from procstats import process_memory
+
+    print("=" * 80)
+    print(f"🚀 YellowCert pre-fork server: {workers} worker(s) x {threads} thread(s) on {args.host}:{args.port}")
+    print("=" * 80)
+
+    # Warm up single-threaded so no OpenMP pool exists when we fork
+    torch.set_num_threads(1)
+    cv2.setNumThreads(1)
+    model_path, _ = api.resolve_model_target()
+    print(f"🔄 Preloading model from {model_path}...")
+    preload_model(model_path)
+    print("✅ Model preloaded and warmed up")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Keep the garbage collector from touching (and un-sharing) inherited objects
+    gc.collect()
+    gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(api.app, sock, threads, args.log_level)
+            finally:
+                os._exit(0)
+        children[pid] = index
+        print(f"✅ Worker {index} started (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    for index in range(workers):
+        spawn(index)
+
+    # Supervise: restart crashed workers and report memory
+    next_report = time.monotonic() + 10
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            index = children.pop(pid, None)
+            if index is not None and not stopping:
+                print(f"⚠️  Worker {index} (pid {pid}) exited with status {status}, restarting")
+                spawn(index)
+            continue
+
+        if not stopping and next_report and time.monotonic() >= next_report:
+            report_memory(children, process_memory)
+            next_report = time.monotonic() + args.report_interval if args.report_interval > 0 else 0
+
+        time.sleep(0.5)
+
+    sock.close()
+    print("👋 All workers stopped")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
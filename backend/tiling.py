@@ -0,0 +1,210 @@
+"""
+YellowCert tiled inference
+Overlapping tiles for high-resolution scans, merged with class-aware NMS
+
+Shrinking a full A4 scan to the model input size leaves small fields
+such as `date` and `signature` only a few pixels tall. In tiled mode the
+scan is cut into overlapping tiles close to the model's native input
+size, every tile (plus one whole-image view, for large objects) goes
+through the model in the same batch, and the boxes are mapped back to
+upload coordinates and de-duplicated per class.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ingest import REDUCED_MODES, letterbox, read_image_size
+
+# "auto" tiles only large scans, "on" tiles every upload, "off" never tiles
+TILE_MODE = os.getenv("TILE_MODE", "auto")
+# Tile edge in decoded pixels; 0 = the model input size (no rescaling)
+TILE_SIZE = int(os.getenv("TILE_SIZE", "0"))
+# Fraction of each tile shared with its neighbour
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+# In auto mode, tile when the whole-image view would shrink the scan by more than this
+TILE_AUTO_FACTOR = float(os.getenv("TILE_AUTO_FACTOR", "2.5"))
+# Upper bound on tiles per image; larger scans are decoded at reduced size
+TILE_MAX_TILES = int(os.getenv("TILE_MAX_TILES", "12"))
+# Same-class boxes overlapping more than this (intersection over the smaller box) are merged
+TILE_MERGE_THRESHOLD = float(os.getenv("TILE_MERGE_THRESHOLD", "0.5"))
+
+# Decode modes from full resolution down, for picking the tile scale
+DECODE_MODES = [(1, cv2.IMREAD_COLOR)] + REDUCED_MODES[::-1]
+
+
+def should_tile(width: int, height: int, imgsz: int, mode: str = TILE_MODE) -> bool:
+    """Decide between whole-image and tiled inference for one upload"""
+    if mode == "on":
+        return True
+    if mode == "off":
+        return False
+    if mode != "auto":
+        raise ValueError(f"Unknown TILE_MODE '{mode}' (expected 'auto', 'on' or 'off')")
+    return max(width, height) > imgsz * TILE_AUTO_FACTOR
+
+
+def _axis_starts(length: int, tile: int, overlap: float) -> List[int]:
+    """Evenly spaced tile offsets covering [0, length) with at least `overlap` shared"""
+    if length <= tile:
+        return [0]
+    stride = max(1, int(tile * (1 - overlap)))
+    count = -(-(length - tile) // stride) + 1
+    return np.linspace(0, length - tile, count).round().astype(int).tolist()
+
+
+def tile_grid(width: int, height: int, tile: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """(x1, y1, x2, y2) of every tile, row by row"""
+    return [
+        (x, y, min(x + tile, width), min(y + tile, height))
+        for y in _axis_starts(height, tile, overlap)
+        for x in _axis_starts(width, tile, overlap)
+    ]
+
+
+def plan_tiles(width: int, height: int, tile: int, overlap: float, max_tiles: int) -> Tuple[int, int, int]:
+    """
+    Pick (decode factor, cv2 mode, tile size) so the grid fits max_tiles
+
+    Prefers the finest decode that fits; if even the smallest decode needs
+    too many tiles, the tiles grow instead (and are downscaled by letterbox).
+    """
+    for factor, mode in DECODE_MODES:
+        if len(tile_grid(-(-width // factor), -(-height // factor), tile, overlap)) <= max_tiles:
+            return factor, mode, tile
+
+    factor, mode = DECODE_MODES[-1]
+    return factor, mode, fit_tile_size(-(-width // factor), -(-height // factor), tile, overlap, max_tiles)
+
+
+def fit_tile_size(width: int, height: int, tile: int, overlap: float, max_tiles: int) -> int:
+    """Grow the tile until the grid over width x height fits max_tiles"""
+    while len(tile_grid(width, height, tile, overlap)) > max_tiles:
+        tile = int(tile * 1.25)
+    return tile
+
+
+def class_aware_nms(xyxy: np.ndarray, cls: np.ndarray, conf: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Greedy NMS within each class; returns indices of the boxes to keep
+
+    Overlap is intersection over the smaller box rather than IoU, so a box
+    cut off at a tile edge is merged into the complete box from the
+    neighbouring tile or the whole-image view.
+    """
+    areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    suppressed = np.zeros(len(xyxy), dtype=bool)
+    keep = []
+    for i in np.argsort(-conf, kind="stable"):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        w = np.minimum(xyxy[i, 2], xyxy[:, 2]) - np.maximum(xyxy[i, 0], xyxy[:, 0])
+        h = np.minimum(xyxy[i, 3], xyxy[:, 3]) - np.maximum(xyxy[i, 1], xyxy[:, 1])
+        inter = w.clip(0) * h.clip(0)
+        overlap = inter / np.maximum(np.minimum(areas[i], areas), 1e-9)
+        suppressed |= (cls == cls[i]) & (overlap > threshold)
+    return np.array(keep, dtype=np.int64)
+
+
+@dataclass
+class TiledImage:
+    """Model inputs for one upload: a whole-image view followed by its tiles"""
+    views: List[np.ndarray]
+    # Per view: letterbox scale, letterbox (left, top) padding, tile offset in decoded pixels
+    transforms: List[Tuple[Tuple[float, float], Tuple[float, float], Tuple[int, int]]]
+    width: int
+    height: int
+    reduction: Tuple[float, float]
+
+    def to_original(self, index: int, xyxy: np.ndarray) -> np.ndarray:
+        """Map (N, 4) boxes from one view's input to original-image coordinates"""
+        (rx, ry), (pad_x, pad_y), (off_x, off_y) = self.transforms[index]
+        boxes = xyxy.astype(np.float64, copy=True)
+        boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad_x) / rx + off_x) * self.reduction[0]
+        boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad_y) / ry + off_y) * self.reduction[1]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, self.width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, self.height)
+        return boxes
+
+    def merge(self, results, threshold: float = TILE_MERGE_THRESHOLD) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Combine per-view YOLO results into de-duplicated (xyxy, cls, conf)"""
+        xyxy, cls, conf = [np.zeros((0, 4))], [np.zeros(0)], [np.zeros(0)]
+        for index, result in enumerate(results):
+            boxes = result.boxes
+            if len(boxes) == 0:
+                continue
+            xyxy.append(self.to_original(index, boxes.xyxy.cpu().numpy()))
+            cls.append(boxes.cls.cpu().numpy())
+            conf.append(boxes.conf.cpu().numpy())
+
+        xyxy, cls, conf = np.concatenate(xyxy), np.concatenate(cls), np.concatenate(conf)
+        # Drop boxes that collapsed to nothing when clipped to the image
+        valid = (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])
+        xyxy, cls, conf = xyxy[valid], cls[valid], conf[valid]
+        keep = class_aware_nms(xyxy, cls, conf, threshold)
+        return xyxy[keep], cls[keep], conf[keep]
+
+
+def ingest_tiled(
+    contents: bytes,
+    imgsz: int,
+    tile: int = TILE_SIZE,
+    overlap: float = TILE_OVERLAP,
+    max_tiles: int = TILE_MAX_TILES
+) -> Optional[TiledImage]:
+    """
+    Decode an upload and cut it into letterboxed overlapping tiles
+
+    Returns None if the bytes are not a decodable image.
+    """
+    tile = tile or imgsz
+    dims = read_image_size(contents)
+    factor, mode, tile = plan_tiles(*dims, tile, overlap, max_tiles) if dims else (1, cv2.IMREAD_COLOR, tile)
+
+    img = cv2.imdecode(np.frombuffer(contents, np.uint8), mode)
+    if img is None:
+        return None
+
+    decoded_h, decoded_w = img.shape[:2]
+    width, height = dims if dims is not None and factor > 1 else (decoded_w, decoded_h)
+    return tile_image(img, imgsz, tile, overlap, width, height)
+
+
+def tile_array(
+    img: np.ndarray,
+    imgsz: int,
+    tile: int = TILE_SIZE,
+    overlap: float = TILE_OVERLAP,
+    max_tiles: int = TILE_MAX_TILES
+) -> TiledImage:
+    """Cut an already decoded BGR image (e.g. a rendered PDF page) into tiles"""
+    height, width = img.shape[:2]
+    tile = fit_tile_size(width, height, tile or imgsz, overlap, max_tiles)
+    return tile_image(img, imgsz, tile, overlap, width, height)
+
+
+def tile_image(img: np.ndarray, imgsz: int, tile: int, overlap: float, width: int, height: int) -> TiledImage:
+    """Whole-image view plus letterboxed tiles of a decoded image"""
+    decoded_h, decoded_w = img.shape[:2]
+
+    # Whole-image view first, so large objects split across tiles are still seen once
+    whole, ratio, pad = letterbox(img, imgsz)
+    views, transforms = [whole], [(ratio, pad, (0, 0))]
+    grid = tile_grid(decoded_w, decoded_h, tile, overlap)
+    # A single tile would just repeat the whole-image view
+    for x1, y1, x2, y2 in grid if len(grid) > 1 else []:
+        boxed, ratio, pad = letterbox(img[y1:y2, x1:x2], imgsz)
+        views.append(boxed)
+        transforms.append((ratio, pad, (x1, y1)))
+
+    return TiledImage(
+        views=views,
+        transforms=transforms,
+        width=width,
+        height=height,
+        reduction=(width / decoded_w, height / decoded_h)
+    )
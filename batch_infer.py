@@ -0,0 +1,295 @@
+"""
+YellowCert Offline Batch Inference - run the detector over a directory of scans
+
+Walks a directory of archived scans and runs them through the same
+ingestion (reduced-resolution decode, letterboxing, tiling) and
+post-processing as the API, without going through HTTP:
+
+    - images are read and decoded in a process pool
+    - at most --prefetch decoded batches wait for the model, so memory
+      stays bounded however large the archive is
+    - each batch is one forward pass; results go to JSONL or Parquet
+    - finished files are appended to a manifest once their results are
+      on disk, so an interrupted run resumes where it stopped
+
+Results use the /predict/batch format (one record per image, "path"
+relative to the input directory). After a crash, the last batch may be
+written twice in JSONL output; its manifest entry is written last.
+
+Usage:
+    python batch_infer.py /archive/scans                              # -> runs/batch_infer/results.jsonl
+    python batch_infer.py /archive/scans --output scans.jsonl
+    python batch_infer.py /archive/scans --format parquet --output runs/batch_infer/results
+    python batch_infer.py /archive/scans --restart                    # discard earlier results and start over
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from inference import ingest_upload, model_input_size, run_model  # noqa: E402
+from tiling import TILE_MODE  # noqa: E402
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+DEFAULT_OUTPUT = os.path.join("runs", "batch_infer", "results.jsonl")
+
+
+def find_images(root: str, done: Set[str]) -> Iterator[str]:
+    """Image paths under root (relative, in a stable order), skipping finished ones"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            rel = os.path.relpath(os.path.join(dirpath, name), root)
+            if rel not in done:
+                yield rel
+
+
+def decode_file(root: str, rel: str, imgsz: int, tile_mode: str) -> Tuple[str, Any, float]:
+    """Read and ingest one image (runs in a decode worker); None marks unreadable files"""
+    start = time.perf_counter()
+    try:
+        with open(os.path.join(root, rel), "rb") as fh:
+            ingested = ingest_upload(fh.read(), imgsz, tile_mode)
+    except OSError:
+        ingested = None
+    return rel, ingested, time.perf_counter() - start
+
+
+def prefetch_batches(
+    executor: ProcessPoolExecutor,
+    root: str,
+    paths: Iterator[str],
+    imgsz: int,
+    tile_mode: str,
+    batch_size: int,
+    prefetch: int
+) -> Iterator[List[Tuple[str, Any, float]]]:
+    """Yield decoded batches in order while up to `prefetch` more decode ahead"""
+    window: deque = deque()
+    for batch in iter(lambda: list(islice(paths, batch_size)), []):
+        window.append([executor.submit(decode_file, root, rel, imgsz, tile_mode) for rel in batch])
+        if len(window) > prefetch:
+            yield [future.result() for future in window.popleft()]
+    while window:
+        yield [future.result() for future in window.popleft()]
+
+
+def to_record(rel: str, result: Optional[Dict[str, Any]], model_name: str) -> Dict[str, Any]:
+    """One output row; every row has the same keys so Parquet gets a fixed schema"""
+    if result is None:
+        return {
+            "path": rel,
+            "success": False,
+            "error": "Invalid image file",
+            "detections": [],
+            "count": 0,
+            "image_size": None,
+            "model": model_name
+        }
+    return {
+        "path": rel,
+        "success": True,
+        "error": None,
+        "detections": result["detections"],
+        "count": len(result["detections"]),
+        "image_size": result["image_size"],
+        "model": model_name
+    }
+
+
+class JsonlWriter:
+    """Appends records to a JSONL file; every written batch is durable at once"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+
+    def write(self, records: List[Dict[str, Any]]) -> List[str]:
+        """Write records; returns the paths now safely on disk"""
+        self._fh.writelines(json.dumps(record) + "\n" for record in records)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        return [record["path"] for record in records]
+
+    def close(self) -> List[str]:
+        self._fh.close()
+        return []
+
+
+class ParquetWriter:
+    """Buffers records and writes them as numbered part files in a directory"""
+
+    def __init__(self, directory: str, rows_per_file: int):
+        import pyarrow as pa
+
+        self._pa = pa
+        self.directory = directory
+        self.rows_per_file = max(1, rows_per_file)
+        self._buffer: List[Dict[str, Any]] = []
+        os.makedirs(directory, exist_ok=True)
+
+        bbox = pa.struct([(key, pa.float64()) for key in ("x1", "y1", "x2", "y2")])
+        detection = pa.struct([("class", pa.string()), ("confidence", pa.float64()), ("bbox", bbox)])
+        self.schema = pa.schema([
+            ("path", pa.string()),
+            ("success", pa.bool_()),
+            ("error", pa.string()),
+            ("detections", pa.list_(detection)),
+            ("count", pa.int64()),
+            ("image_size", pa.struct([("width", pa.int64()), ("height", pa.int64())])),
+            ("model", pa.string()),
+        ])
+        # Continue numbering after parts left by earlier (resumed) runs
+        self._part = len([name for name in os.listdir(directory) if name.endswith(".parquet")])
+
+    def write(self, records: List[Dict[str, Any]]) -> List[str]:
+        """Buffer records; returns the paths of a part file once one is written"""
+        self._buffer.extend(records)
+        if len(self._buffer) < self.rows_per_file:
+            return []
+        return self._flush()
+
+    def _flush(self) -> List[str]:
+        import pyarrow.parquet as pq
+
+        if not self._buffer:
+            return []
+        table = self._pa.Table.from_pylist(self._buffer, schema=self.schema)
+        path = os.path.join(self.directory, f"part-{self._part:05d}.parquet")
+        # Write under a temporary name so a crash never leaves a truncated part
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        self._part += 1
+        written = [record["path"] for record in self._buffer]
+        self._buffer = []
+        return written
+
+    def close(self) -> List[str]:
+        return self._flush()
+
+
+def load_manifest(path: str) -> Set[str]:
+    """Relative paths of images finished by earlier runs"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as fh:
+        return {line.rstrip("\n") for line in fh if line.strip()}
+
+
+def clear_previous_run(output: str, manifest_path: str):
+    """Drop results and manifest of earlier runs so --restart starts clean"""
+    if os.path.isdir(output):
+        for name in os.listdir(output):
+            if name.endswith((".parquet", ".parquet.tmp")):
+                os.remove(os.path.join(output, name))
+    elif os.path.exists(output):
+        os.remove(output)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run YellowCert detection over a directory of scans")
+    parser.add_argument("input", help="Directory of images (searched recursively)")
+    parser.add_argument("--weights", default="models/best.pt", help="Model artifact (any backend format)")
+    parser.add_argument("--output", default=None,
+                        help=f"JSONL file or Parquet directory (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--manifest", default=None, help="Finished-files list (default: <output>.manifest)")
+    parser.add_argument("--restart", action="store_true", help="Discard earlier results and manifest, process everything")
+    parser.add_argument("--conf", type=float, default=0.1, help="Inference threshold (matches backend)")
+    parser.add_argument("--batch", type=int, default=8, help="Images per forward pass")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="Decode processes")
+    parser.add_argument("--prefetch", type=int, default=4, help="Decoded batches allowed to wait for the model")
+    parser.add_argument("--tile-mode", choices=["auto", "on", "off"], default=TILE_MODE)
+    parser.add_argument("--parquet-rows", type=int, default=5000, help="Rows per Parquet part file")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("YellowCert Offline Batch Inference")
+    print("=" * 80)
+
+    if not os.path.isdir(args.input):
+        print(f"❌ ERROR: {args.input} is not a directory")
+        sys.exit(1)
+    if not os.path.exists(args.weights):
+        print(f"❌ ERROR: {args.weights} not found. Train a model first (python train_model.py).")
+        sys.exit(1)
+
+    output = args.output or (DEFAULT_OUTPUT if args.format == "jsonl" else os.path.splitext(DEFAULT_OUTPUT)[0])
+    manifest_path = args.manifest or output.rstrip("/\\") + ".manifest"
+    if args.restart:
+        clear_previous_run(output, manifest_path)
+    done = load_manifest(manifest_path)
+    if done:
+        print(f"🔄 Resuming: {len(done)} image(s) already in {manifest_path}")
+
+    from ultralytics import YOLO
+
+    model = YOLO(args.weights, task="detect")
+    imgsz = model_input_size(model, args.weights)
+    model_name = os.path.basename(os.path.normpath(args.weights))
+    print(f"✓ Model {args.weights} (imgsz={imgsz}), {args.workers} decode worker(s), batch {args.batch}")
+
+    if args.format == "parquet":
+        try:
+            writer = ParquetWriter(output, args.parquet_rows)
+        except ImportError:
+            print("❌ ERROR: Parquet output needs pyarrow (pip install pyarrow)")
+            sys.exit(1)
+    else:
+        writer = JsonlWriter(output)
+
+    processed = 0
+    failed = 0
+    start = last_report = time.perf_counter()
+    # spawn: forking after torch has loaded the model is not safe
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=multiprocessing.get_context("spawn")) as executor, \
+            open(manifest_path, "a", encoding="utf-8") as manifest:
+
+        def commit(paths: List[str]):
+            if paths:
+                manifest.writelines(path + "\n" for path in paths)
+                manifest.flush()
+
+        batches = prefetch_batches(executor, args.input, find_images(args.input, done), imgsz,
+                                   args.tile_mode, max(1, args.batch), max(1, args.prefetch))
+        try:
+            for batch in batches:
+                rels, inputs, decode_times = zip(*batch)
+                results = run_model(model, imgsz, list(inputs), list(decode_times), args.conf)
+                records = [to_record(rel, result, model_name) for rel, result in zip(rels, results)]
+                commit(writer.write(records))
+
+                processed += len(records)
+                failed += sum(1 for record in records if not record["success"])
+                now = time.perf_counter()
+                if now - last_report >= args.report_every:
+                    print(f"   {processed:,} image(s), {processed / (now - start):.1f} img/s")
+                    last_report = now
+        finally:
+            commit(writer.close())
+
+    elapsed = time.perf_counter() - start
+    print("\n" + "=" * 80)
+    print(f"✅ {processed:,} image(s) in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.1f} img/s), "
+          f"{failed} unreadable")
+    print(f"   Results: {output}")
+    print(f"   Manifest: {manifest_path}")
+    print("=" * 80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
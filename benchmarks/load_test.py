@@ -0,0 +1,313 @@
+"""
+/predict load test and latency benchmark
+
+Starts the backend locally, replays the bundled images from test/images
+and valid/images against /predict at a configurable concurrency (and
+optionally a fixed request rate), then reports throughput, p50/p95/p99
+latency, error rate and the server's peak memory.
+
+Everything runs offline: the server loads a local model file (models/best.pt
+by default) and the result cache is disabled unless --cache is given, so
+every request pays for real inference.
+
+Results are written as JSON. Passing --baseline compares the run with an
+earlier result file and exits non-zero if throughput, p95 latency or error
+rate regressed by more than --max-regression.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 8 --requests 200
+    python benchmarks/load_test.py --rate 5 --duration 60 --output bench.json
+    python benchmarks/load_test.py --server serve --workers 4 --baseline bench.json
+"""
+
+import argparse
+import glob
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+sys.path.insert(0, BACKEND_DIR)
+from procstats import process_tree_memory  # noqa: E402
+
+
+def load_images(dirs: List[str]) -> List[Dict[str, Any]]:
+    """Read the bundled dataset images into memory once"""
+    images = []
+    for directory in dirs:
+        for path in sorted(glob.glob(os.path.join(ROOT, directory, "*.jpg"))):
+            with open(path, "rb") as fh:
+                images.append({"name": os.path.basename(path), "data": fh.read()})
+    return images
+
+
+def encode_multipart(name: str, data: bytes):
+    """Build a multipart/form-data body with a single 'file' field"""
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode("utf-8")
+    body = head + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def start_server(args) -> subprocess.Popen:
+    """Launch uvicorn (or the pre-fork server) against a local model"""
+    env = dict(os.environ)
+    env["MODEL_PATH"] = os.path.abspath(args.model)
+    env["PYTHONUNBUFFERED"] = "1"
+    if not args.cache:
+        env["RESULT_CACHE_BACKEND"] = "off"
+
+    if args.server == "serve":
+        cmd = [sys.executable, "serve.py", "--host", args.host, "--port", str(args.port),
+               "--workers", str(args.workers), "--report-interval", "0"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", args.host, "--port", str(args.port)]
+
+    # The child inherits its own copy of the descriptor, so ours can close right away
+    with open(args.server_log, "w") as log:
+        return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_ready(server: subprocess.Popen, host: str, port: int, timeout: float) -> float:
+    """Poll GET /ready until the model is loaded and warmed up; returns seconds waited"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode} (is port {port} in use?)")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request("GET", "/ready")
+            response = conn.getresponse()
+            payload = json.loads(response.read())
+            conn.close()
+            if response.status == 200 and payload.get("ready"):
+                return time.perf_counter() - start
+            if payload.get("error"):
+                raise RuntimeError(f"Server failed to load the model: {payload['error']}")
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.25)
+    raise TimeoutError(f"Server did not become ready within {timeout:.0f}s")
+
+
+class MemorySampler(threading.Thread):
+    """Tracks peak summed RSS/PSS of the server process tree"""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_pss_mb = 0.0
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.is_set():
+            mem = process_tree_memory(self.pid)
+            self.peak_rss_mb = max(self.peak_rss_mb, mem["rss_mb"])
+            self.peak_pss_mb = max(self.peak_pss_mb, mem["pss_mb"])
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_load(args, images: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Send requests at the configured concurrency/rate and collect timings"""
+    local = threading.local()
+    bodies = [encode_multipart(img["name"], img["data"]) for img in images]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def send(index: int, scheduled: float):
+        # Open-loop mode: wait for this request's slot in the schedule
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(args.host, args.port, timeout=args.timeout)
+        body, content_type = bodies[index % len(bodies)]
+        start = time.perf_counter()
+        try:
+            local.conn.request("POST", "/predict", body=body, headers={"Content-Type": content_type})
+            response = local.conn.getresponse()
+            response.read()
+            status = str(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            local.conn.close()
+            del local.conn
+            status = type(e).__name__
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == "200":
+                latencies.append(elapsed)
+
+    total = args.requests if args.rate <= 0 else int(args.rate * args.duration)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for i in range(total):
+            scheduled = start + i / args.rate if args.rate > 0 else 0.0
+            executor.submit(send, i, scheduled)
+    wall = time.perf_counter() - start
+
+    ok = len(latencies)
+    return {
+        "requests": total,
+        "succeeded": ok,
+        "statuses": statuses,
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(ok / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / ok * 1000, 2) if ok else None,
+            "p50": round(percentile(latencies, 50) * 1000, 2) if ok else None,
+            "p95": round(percentile(latencies, 95) * 1000, 2) if ok else None,
+            "p99": round(percentile(latencies, 99) * 1000, 2) if ok else None,
+            "max": round(max(latencies) * 1000, 2) if ok else None,
+        },
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Return a description of every metric that regressed beyond the threshold"""
+    failures = []
+    old_rps, new_rps = baseline["throughput_rps"], result["throughput_rps"]
+    if old_rps and new_rps < old_rps * (1 - max_regression):
+        failures.append(f"throughput {new_rps:.2f} rps < baseline {old_rps:.2f} rps")
+
+    old_p95, new_p95 = baseline["latency_ms"]["p95"], result["latency_ms"]["p95"]
+    if old_p95 and new_p95 and new_p95 > old_p95 * (1 + max_regression):
+        failures.append(f"p95 latency {new_p95:.1f} ms > baseline {old_p95:.1f} ms")
+
+    if result["error_rate"] > baseline["error_rate"] + max_regression:
+        failures.append(f"error rate {result['error_rate']:.2%} > baseline {baseline['error_rate']:.2%}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the YellowCert /predict API")
+    parser.add_argument("--model", default=os.path.join(ROOT, "models", "best.pt"), help="Local model file to serve")
+    parser.add_argument("--images", nargs="+", default=["test/images", "valid/images"])
+    parser.add_argument("--server", choices=["uvicorn", "serve"], default="uvicorn",
+                        help="uvicorn main:app or the pre-fork serve.py")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes for --server serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=4, help="Simultaneous client connections")
+    parser.add_argument("--requests", type=int, default=100, help="Total requests (closed loop)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Requests per second (open loop, 0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run when --rate is set")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before the run")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="Earlier result JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed relative regression vs the baseline")
+    parser.add_argument("--server-log", default=os.path.join(ROOT, "runs", "load_test_server.log"))
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ ERROR: model file {args.model} not found (the load test never downloads weights)")
+        sys.exit(1)
+
+    images = load_images(args.images)
+    if not images:
+        print(f"❌ ERROR: no images found in {args.images}")
+        sys.exit(1)
+
+    print("=" * 80)
+    print("YellowCert /predict load test")
+    print("=" * 80)
+    print(f"Images: {len(images)} from {', '.join(args.images)}")
+    mode = f"{args.rate} req/s for {args.duration}s" if args.rate > 0 else f"{args.requests} requests"
+    print(f"Load: {mode}, concurrency {args.concurrency}, server {args.server}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.server_log)), exist_ok=True)
+    server = start_server(args)
+    sampler = None
+    try:
+        ready = wait_until_ready(server, args.host, args.port, timeout=300)
+        print(f"✓ Server ready after {ready:.1f}s")
+
+        if args.warmup > 0:
+            run_load(argparse.Namespace(**{**vars(args), "requests": args.warmup, "rate": 0.0}), images)
+
+        sampler = MemorySampler(server.pid)
+        sampler.start()
+        result = run_load(args, images)
+    finally:
+        server.terminate()
+        if sampler is not None:
+            sampler.stop()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    result.update({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "model": os.path.abspath(args.model),
+            "server": args.server,
+            "workers": args.workers if args.server == "serve" else 1,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "images": len(images),
+            "cache": args.cache,
+        },
+        "startup_seconds": round(ready, 2),
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1),
+        "peak_pss_mb": round(sampler.peak_pss_mb, 1),
+    })
+
+    latency = result["latency_ms"]
+    print("\n📊 Results")
+    print(f"   - Throughput: {result['throughput_rps']:.2f} req/s")
+    print(f"   - Latency p50/p95/p99: {latency['p50']} / {latency['p95']} / {latency['p99']} ms")
+    print(f"   - Error rate: {result['error_rate']:.2%} {result['statuses']}")
+    print(f"   - Peak server RSS: {result['peak_rss_mb']:.1f} MB (PSS {result['peak_pss_mb']:.1f} MB)")
+
+    with open(args.output, "w") as fh:
+        json.dump(result, fh, indent=2)
+    print(f"\n✓ Results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            failures = compare(result, json.load(fh), args.max_regression)
+        if failures:
+            print(f"\n❌ Regression vs {args.baseline}:")
+            for failure in failures:
+                print(f"   - {failure}")
+            sys.exit(1)
+        print(f"✅ No regression beyond {args.max_regression:.0%} vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
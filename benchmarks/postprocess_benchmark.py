@@ -0,0 +1,74 @@
+"""
+Post-processing micro-benchmark
+
+Compares the per-box process_detection loop against the vectorized
+process_boxes on synthetic YOLO results, and checks both produce
+identical JSON.
+
+Usage:
+    python benchmarks/postprocess_benchmark.py --boxes 5 50 300 --device cpu
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+import torch
+from ultralytics.engine.results import Boxes
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from detection import CLASS_NAMES, process_boxes, process_detection  # noqa: E402
+
+
+def make_boxes(n: int, device: str) -> Boxes:
+    """Build a Boxes object with n random detections on a 1024x1448 scan"""
+    generator = torch.Generator().manual_seed(n)
+    xy1 = torch.rand(n, 2, generator=generator) * 900
+    wh = torch.rand(n, 2, generator=generator) * 120 + 5
+    conf = torch.rand(n, 1, generator=generator) * 0.9 + 0.1
+    cls = torch.randint(0, len(CLASS_NAMES), (n, 1), generator=generator).float()
+    data = torch.cat([xy1, xy1 + wh, conf, cls], dim=1).to(device)
+    return Boxes(data, (1448, 1024))
+
+
+def per_box(boxes: Boxes):
+    """Current approach: one host transfer per box attribute"""
+    return [process_detection(box, CLASS_NAMES) for box in boxes]
+
+
+def vectorized(boxes: Boxes):
+    """New approach: one host transfer per result"""
+    return process_boxes(boxes, CLASS_NAMES)
+
+
+def run_benchmark(box_counts, device: str, repeat: int):
+    print("=" * 80)
+    print(f"Post-processing benchmark (device: {device})")
+    print("=" * 80)
+    print(f"{'boxes':>8} {'per-box (ms)':>14} {'vectorized (ms)':>17} {'speedup':>9}")
+
+    for n in box_counts:
+        boxes = make_boxes(n, device)
+
+        # Outputs must serialize identically
+        if json.dumps(per_box(boxes)) != json.dumps(vectorized(boxes)):
+            raise AssertionError(f"Output mismatch for {n} boxes")
+
+        number = max(1, 2000 // max(n, 1))
+        old = min(timeit.repeat(lambda: per_box(boxes), number=number, repeat=repeat)) / number
+        new = min(timeit.repeat(lambda: vectorized(boxes), number=number, repeat=repeat)) / number
+        print(f"{n:>8} {old * 1000:>14.3f} {new * 1000:>17.3f} {old / new:>8.1f}x")
+
+    print("=" * 80)
+    print("✓ Outputs identical for every box count")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark detection post-processing")
+    parser.add_argument("--boxes", type=int, nargs="+", default=[1, 10, 50, 300])
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run_benchmark(args.boxes, args.device, args.repeat)
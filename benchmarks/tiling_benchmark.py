@@ -0,0 +1,192 @@
+"""
+Tiled inference benchmark
+
+Runs every test image through the serving code path (inference.detect_batch)
+once as a whole image and once tiled, and reports per-image latency next to
+per-class recall/precision against the YOLO labels, so the latency cost of
+tiling can be weighed against the recall gain on small classes.
+
+Usage:
+    python benchmarks/tiling_benchmark.py --model models/best.pt
+    python benchmarks/tiling_benchmark.py --tile-size 416 --overlap 0.25 --json tiling.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+ROOT_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+def load_labels(label_path: str, width: int, height: int):
+    """YOLO txt labels as (cls array, xyxy array) in pixels"""
+    if not os.path.exists(label_path):
+        return np.zeros(0, dtype=int), np.zeros((0, 4))
+    rows = np.loadtxt(label_path, ndmin=2)
+    if rows.size == 0:
+        return np.zeros(0, dtype=int), np.zeros((0, 4))
+    cls = rows[:, 0].astype(int)
+    cx, cy, w, h = rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    return cls, np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (N, 4) and (M, 4) boxes"""
+    w = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    h = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = w.clip(0) * h.clip(0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match(detections, gt_cls, gt_xyxy, class_names, iou_threshold: float):
+    """Greedy same-class matching; returns per-class (tp, n_pred, n_gt) counts"""
+    counts = {name: [0, 0, 0] for name in class_names}
+    for c in gt_cls:
+        counts[class_names[c]][2] += 1
+
+    used = np.zeros(len(gt_cls), dtype=bool)
+    for det in sorted(detections, key=lambda d: -d["confidence"]):
+        if det["class"] not in counts:
+            continue
+        counts[det["class"]][1] += 1
+        candidates = np.flatnonzero((gt_cls == class_names.index(det["class"])) & ~used)
+        if len(candidates) == 0:
+            continue
+        bbox = det["bbox"]
+        ious = box_iou(np.array([[bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]]]), gt_xyxy[candidates])[0]
+        best = int(np.argmax(ious))
+        if ious[best] >= iou_threshold:
+            used[candidates[best]] = True
+            counts[det["class"]][0] += 1
+    return counts
+
+
+def run_mode(mode: str, images, detect_batch, class_names, conf: float, iou: float, warmup: int):
+    """Detect every image in one tiling mode; returns latencies and class counts"""
+    import cv2
+
+    for path in images[:warmup]:
+        with open(path, "rb") as fh:
+            detect_batch([fh.read()], conf, mode)
+
+    latencies = []
+    totals = {name: [0, 0, 0] for name in class_names}
+    for path in images:
+        with open(path, "rb") as fh:
+            contents = fh.read()
+        start = time.perf_counter()
+        result = detect_batch([contents], conf, mode)[0]
+        latencies.append(time.perf_counter() - start)
+        if result is None:
+            continue
+
+        height, width = cv2.imread(path).shape[:2]
+        label_path = os.path.join(os.path.dirname(os.path.dirname(path)), "labels",
+                                  os.path.splitext(os.path.basename(path))[0] + ".txt")
+        gt_cls, gt_xyxy = load_labels(label_path, width, height)
+        for name, (tp, n_pred, n_gt) in match(result["detections"], gt_cls, gt_xyxy, class_names, iou).items():
+            totals[name][0] += tp
+            totals[name][1] += n_pred
+            totals[name][2] += n_gt
+    return latencies, totals
+
+
+def summarize(latencies, totals):
+    tp = sum(t[0] for t in totals.values())
+    n_pred = sum(t[1] for t in totals.values())
+    n_gt = sum(t[2] for t in totals.values())
+    return {
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1),
+            "p50": round(statistics.median(latencies) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1),
+        },
+        "recall": round(tp / n_gt, 4) if n_gt else None,
+        "precision": round(tp / n_pred, 4) if n_pred else None,
+        "per_class": {
+            name: {
+                "recall": round(t[0] / t[2], 4) if t[2] else None,
+                "precision": round(t[0] / t[1], 4) if t[1] else None,
+                "gt": t[2],
+            }
+            for name, t in totals.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare whole-image and tiled inference")
+    parser.add_argument("--model", default=os.path.join(ROOT_DIR, "models", "best.pt"))
+    parser.add_argument("--images", default=os.path.join(ROOT_DIR, "test", "images"))
+    parser.add_argument("--conf", type=float, default=0.1, help="Confidence threshold (the API uses 0.1)")
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for a detection to count as a hit")
+    parser.add_argument("--tile-size", type=int, default=0, help="Tile edge in pixels (0 = model input size)")
+    parser.add_argument("--overlap", type=float, default=None, help="Tile overlap fraction")
+    parser.add_argument("--max-tiles", type=int, default=None, help="Maximum tiles per image")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed images per mode")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N images")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    # Tiling is configured from the environment, so set it before importing the backend
+    os.environ["TILE_SIZE"] = str(args.tile_size)
+    if args.overlap is not None:
+        os.environ["TILE_OVERLAP"] = str(args.overlap)
+    if args.max_tiles is not None:
+        os.environ["TILE_MAX_TILES"] = str(args.max_tiles)
+    sys.path.insert(0, BACKEND_DIR)
+    from detection import CLASS_NAMES
+    from inference import detect_batch, init_worker
+
+    images = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+    if args.limit:
+        images = images[:args.limit]
+    if not images:
+        print(f"❌ No images found in {args.images}")
+        return 1
+
+    init_worker(args.model)
+
+    print("=" * 80)
+    print(f"Tiled inference benchmark: {len(images)} image(s), model {args.model}")
+    print("=" * 80)
+
+    report = {"model": args.model, "images": len(images), "conf": args.conf, "modes": {}}
+    for mode in ("off", "on"):
+        latencies, totals = run_mode(mode, images, detect_batch, CLASS_NAMES, args.conf, args.iou, args.warmup)
+        report["modes"][mode] = summarize(latencies, totals)
+
+    whole, tiled = report["modes"]["off"], report["modes"]["on"]
+    print(f"{'':<14} {'whole image':>14} {'tiled':>14}")
+    print(f"{'mean ms':<14} {whole['latency_ms']['mean']:>14} {tiled['latency_ms']['mean']:>14}")
+    print(f"{'p50 ms':<14} {whole['latency_ms']['p50']:>14} {tiled['latency_ms']['p50']:>14}")
+    print(f"{'recall':<14} {str(whole['recall']):>14} {str(tiled['recall']):>14}")
+    print(f"{'precision':<14} {str(whole['precision']):>14} {str(tiled['precision']):>14}")
+    print("-" * 80)
+    print(f"{'class':<14} {'gt':>5} {'recall (whole)':>16} {'recall (tiled)':>16}")
+    for name in CLASS_NAMES:
+        before, after = whole["per_class"][name], tiled["per_class"][name]
+        if before["gt"]:
+            print(f"{name:<14} {before['gt']:>5} {str(before['recall']):>16} {str(after['recall']):>16}")
+    print("=" * 80)
+    slowdown = tiled["latency_ms"]["mean"] / whole["latency_ms"]["mean"]
+    print(f"📊 Tiling costs {slowdown:.1f}x latency per image")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"✅ Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
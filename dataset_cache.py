@@ -0,0 +1,331 @@
+"""
+YellowCert Dataset Cache - preprocessed, memory-mapped training images
+
+Every training run used to re-decode the JPEGs in train/images and
+valid/images, and cache=True then held a private RAM copy per process
+(several GB at imgsz=1280). This builds, once per image size, the images
+already resized the way Ultralytics resizes them (long side = imgsz)
+into flat uint8 shards that training runs memory-map. The OS page cache
+shares them between runs and dataloader workers.
+
+    cache/dataset/imgsz1280/
+        index.json          # fingerprint, shard files, per-image offsets and shapes
+        images-000.bin      # raw HWC BGR pixels, images back to back
+        images-001.bin
+
+The fingerprint covers data.yaml and the path, size and mtime of every
+split image, so adding, removing or replacing images (or editing
+data.yaml) rebuilds the cache on the next run. Labels are already cached
+by Ultralytics in <split>/labels.cache and are left to it.
+
+Usage (from the project root):
+    python dataset_cache.py --imgsz 640 1024 1280     # build / refresh ahead of time
+    python dataset_cache.py --clear                   # delete every cached size
+
+Training scripts call train_with_cache(model, ...) instead of
+model.train(...); set DATASET_CACHE=0 to train without it.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import yaml
+
+CACHE_ROOT = os.path.join("cache", "dataset")
+CACHE_VERSION = 1
+# Set DATASET_CACHE=0 to fall back to plain Ultralytics loading
+USE_DATASET_CACHE = os.getenv("DATASET_CACHE", "1") != "0"
+SHARD_BYTES = 2 << 30
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+# Splits read while training (the test split is only used for evaluation)
+TRAIN_SPLITS = ("train", "val")
+
+# (shard, offset, h0, w0, h, w)
+Entry = Tuple[int, int, int, int, int, int]
+
+
+def split_images(data: str, splits=TRAIN_SPLITS) -> List[str]:
+    """Real paths of every image listed by data.yaml for the given splits"""
+    with open(data, encoding="utf-8") as fh:
+        config = yaml.safe_load(fh)
+    base = config.get("path") or os.path.dirname(os.path.abspath(data))
+
+    images = []
+    for split in splits:
+        sources = config.get(split) or []
+        for source in sources if isinstance(sources, list) else [sources]:
+            source = source if os.path.isabs(source) else os.path.join(base, source)
+            if os.path.isdir(source):
+                for dirpath, _, filenames in os.walk(source):
+                    images.extend(os.path.join(dirpath, name) for name in filenames
+                                  if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+            elif source.endswith(".txt") and os.path.exists(source):
+                with open(source, encoding="utf-8") as fh:
+                    images.extend(os.path.join(os.path.dirname(source), line.strip())
+                                  for line in fh if line.strip())
+    return sorted({os.path.realpath(path) for path in images})
+
+
+def dataset_fingerprint(data: str, images: List[str], imgsz: int) -> str:
+    """Hash of data.yaml plus the path, size and mtime of every image"""
+    digest = hashlib.sha256(f"v{CACHE_VERSION}|imgsz={imgsz}|".encode("utf-8"))
+    with open(data, "rb") as fh:
+        digest.update(fh.read())
+    for path in images:
+        stat = os.stat(path)
+        digest.update(f"|{path}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def resize_like_ultralytics(path: str, imgsz: int) -> Optional[Tuple[np.ndarray, int, int]]:
+    """Decode and resize the long side to imgsz exactly as BaseDataset.load_image does"""
+    im = cv2.imread(path, cv2.IMREAD_COLOR)
+    if im is None:
+        return None
+    h0, w0 = im.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(im), h0, w0
+
+
+class ShardCache:
+    """Read side of a built cache: image path -> resized pixels via np.memmap"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, "index.json"), encoding="utf-8") as fh:
+            index = json.load(fh)
+        self.imgsz = index["imgsz"]
+        self.fingerprint = index["fingerprint"]
+        self.shards = index["shards"]
+        self.entries: Dict[str, Entry] = {path: tuple(entry) for path, entry in index["images"].items()}
+        self._maps: Dict[int, np.memmap] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Dataloader workers re-open the maps instead of pickling their pages
+        state = self.__dict__.copy()
+        state["_maps"] = {}
+        return state
+
+    def _map(self, shard: int) -> np.memmap:
+        if shard not in self._maps:
+            self._maps[shard] = np.memmap(os.path.join(self.directory, self.shards[shard]), dtype=np.uint8, mode="r")
+        return self._maps[shard]
+
+    def load(self, path: str) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """(writable resized image, original hw) or None if the image isn't cached"""
+        entry = self.entries.get(os.path.realpath(path))
+        if entry is None:
+            return None
+        shard, offset, h0, w0, h, w = entry
+        pixels = self._map(shard)[offset:offset + h * w * 3]
+        return pixels.reshape(h, w, 3).copy(), (h0, w0)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def build_cache(data: str, imgsz: int, directory: str, images: List[str], fingerprint: str,
+                workers: int = min(8, os.cpu_count() or 1)):
+    """Decode, resize and write every image into fresh shards"""
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+
+    shards: List[str] = []
+    entries: Dict[str, Entry] = {}
+    out = None
+    offset = 0
+    start = time.perf_counter()
+    try:
+        # cv2 releases the GIL, so threads decode in parallel; map keeps the order
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for path, decoded in zip(images, executor.map(lambda p: resize_like_ultralytics(p, imgsz), images)):
+                if decoded is None:
+                    print(f"   ⚠️  Skipping unreadable image {path}")
+                    continue
+                im, h0, w0 = decoded
+                if out is None or offset + im.nbytes > SHARD_BYTES:
+                    if out is not None:
+                        out.close()
+                    shards.append(f"images-{len(shards):03d}.bin")
+                    out = open(os.path.join(directory, shards[-1]), "wb")
+                    offset = 0
+                out.write(im.tobytes())
+                entries[path] = (len(shards) - 1, offset, h0, w0, im.shape[0], im.shape[1])
+                offset += im.nbytes
+    finally:
+        if out is not None:
+            out.close()
+
+    # The index is written last: a half-built cache has none and is rebuilt
+    with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as fh:
+        json.dump({
+            "version": CACHE_VERSION,
+            "imgsz": imgsz,
+            "data": os.path.abspath(data),
+            "fingerprint": fingerprint,
+            "created": time.time(),
+            "shards": shards,
+            "images": entries
+        }, fh)
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in shards)
+    print(f"✓ Cached {len(entries)} image(s) at imgsz={imgsz} in {time.perf_counter() - start:.1f}s "
+          f"({size / (1 << 20):.0f} MB, {len(shards)} shard(s)) -> {directory}")
+
+
+@contextmanager
+def build_lock(path: str):
+    """Exclusive lock on a lock file, held across processes"""
+    with open(path, "a+b") as fh:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after 10 s
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def open_if_current(directory: str, fingerprint: str) -> Optional[ShardCache]:
+    """The cache in directory if it was built from this fingerprint"""
+    try:
+        cache = ShardCache(directory)
+    except (OSError, ValueError, KeyError):
+        return None
+    return cache if cache.fingerprint == fingerprint else None
+
+
+def ensure_cache(data: str = "data.yaml", imgsz: int = 640, root: str = CACHE_ROOT) -> ShardCache:
+    """
+    Open the cache for imgsz, building or rebuilding it if the dataset changed
+
+    Builds are serialized per imgsz with a lock file, so parallel runs
+    (e.g. sweep trials) build each size once instead of deleting each
+    other's shards.
+    """
+    images = split_images(data)
+    fingerprint = dataset_fingerprint(data, images, imgsz)
+    directory = os.path.join(root, f"imgsz{imgsz}")
+
+    cache = open_if_current(directory, fingerprint)
+    if cache is None:
+        os.makedirs(root, exist_ok=True)
+        with build_lock(f"{directory}.lock"):
+            # Another process may have built it while we waited
+            cache = open_if_current(directory, fingerprint)
+            if cache is None:
+                print(f"🔄 Building dataset cache for imgsz={imgsz} ({directory})")
+                build_cache(data, imgsz, directory, images, fingerprint)
+                return ShardCache(directory)
+
+    print(f"✓ Dataset cache up to date: {len(cache)} image(s) at imgsz={imgsz} ({directory})")
+    return cache
+
+
+def _sharded_dataset_class():
+    """YOLODataset whose load_image reads from a ShardCache (imports ultralytics lazily)"""
+    from ultralytics.data.dataset import YOLODataset
+
+    class ShardedYOLODataset(YOLODataset):
+        shards: Optional[ShardCache] = None
+
+        def load_image(self, i, rect_mode=True, **kwargs):
+            cached = None
+            if (self.ims[i] is None and rect_mode and not kwargs.get("resize_short")
+                    and self.shards is not None and self.shards.imgsz == self.imgsz):
+                cached = self.shards.load(self.im_files[i])
+            if cached is None:
+                return super().load_image(i, rect_mode, **kwargs)
+
+            im, hw0 = cached
+            # Same buffer bookkeeping as BaseDataset.load_image: mosaic samples from it
+            if self.augment and self.cache != "ram":
+                self.ims[i], self.im_hw0[i], self.im_hw[i] = im, hw0, im.shape[:2]
+                self.buffer.append(i)
+                if 1 < len(self.buffer) >= self.max_buffer_length:
+                    j = self.buffer.pop(0)
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+            return im, hw0, im.shape[:2]
+
+    return ShardedYOLODataset
+
+
+def sharded_trainer(shards: ShardCache):
+    """DetectionTrainer whose train and val datasets read from the shard cache"""
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    dataset_class = _sharded_dataset_class()
+
+    class ShardedDetectionTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode="train", batch=None):
+            dataset = super().build_dataset(img_path, mode, batch)
+            if type(dataset).__name__ == "YOLODataset":
+                # Only load_image differs, so the built dataset is switched over in place
+                dataset.__class__ = dataset_class
+                dataset.shards = shards
+            return dataset
+
+    return ShardedDetectionTrainer
+
+
+def train_with_cache(model, cache_data: Optional[str] = None, **train_args):
+    """
+    model.train(**train_args), reading images from the shard cache
+
+    Replaces cache=True/"ram": the memory-mapped shards make a per-process
+    RAM copy unnecessary. With DATASET_CACHE=0 this is plain model.train.
+    cache_data names the data.yaml whose images are cached, when training
+    on a derived one whose images symlink to the same files (distill.py).
+    """
+    if not USE_DATASET_CACHE:
+        return model.train(**train_args)
+
+    shards = ensure_cache(cache_data or train_args.get("data", "data.yaml"), train_args.get("imgsz", 640))
+    train_args["cache"] = False
+    return model.train(trainer=sharded_trainer(shards), **train_args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped training image cache")
+    parser.add_argument("--data", default="data.yaml")
+    parser.add_argument("--imgsz", type=int, nargs="+", default=[640], help="Image size(s) to cache")
+    parser.add_argument("--root", default=CACHE_ROOT)
+    parser.add_argument("--clear", action="store_true", help="Delete every cached size and exit")
+    args = parser.parse_args()
+
+    if args.clear:
+        shutil.rmtree(args.root, ignore_errors=True)
+        print(f"✓ Removed {args.root}")
+        return
+
+    for imgsz in args.imgsz:
+        ensure_cache(args.data, imgsz, args.root)
+
+
+if __name__ == "__main__":
+    main()
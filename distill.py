@@ -0,0 +1,359 @@
+"""
+YellowCert Distillation - train a CPU-friendly student from the large teacher
+
+The yolov8x from train_max_accuracy.py (models/best_max.pt) is too slow
+to serve on CPU, and the yolov8n from train_quick.py is much less
+accurate. This trains a yolov8s (or yolov8n) student with the teacher's
+knowledge, in two ways:
+
+    1. Pseudo-labels: the teacher predicts on train/images, and its
+       detections above --pseudo-conf that match no annotated box
+       (IoU < --match-iou) are added to the labels of a derived dataset
+       (cache/distill/<key>/, images symlinked, reused while unchanged).
+       The default of 0.3 is low on purpose: YOLOv8 scores run low, and
+       the teacher's correct boxes on small fields (date, signature),
+       the ones annotators miss, often score 0.3-0.5. Raise it if its
+       false positives start showing up in the labels.
+    2. Soft targets: on every training batch the teacher sees the same
+       augmented images, and a distillation term is added to the
+       student's detection loss. It is the KL divergence between
+       temperature-softened class scores at every anchor, including the
+       low-confidence ones hard labels drop, plus the KL between box
+       (DFL) distributions weighted by the teacher's confidence.
+
+The student is published to models/best.pt, and a report compares its
+test-split accuracy and CPU latency with the teacher and with the
+plain-trained small model (evaluate_models.py measurements).
+
+Usage:
+    python distill.py                                       # yolov8s student at imgsz 640
+    python distill.py --student yolov8n.pt --set epochs=100
+    python distill.py --baseline runs/detect/yellowcert_quick/weights/best.pt
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import yaml
+
+import training
+from dataset_cache import dataset_fingerprint, split_images
+from evaluate_models import flag_pareto, format_table, measure_artifact
+
+DISTILL_ROOT = os.path.join("cache", "distill")
+REPORT_DIR = os.path.join("runs", "distill")
+DEFAULT_BASELINE = os.path.join("runs", "detect", "yellowcert_quick", "weights", "best.pt")
+
+
+def label_path(image_path: str) -> str:
+    """Label file Ultralytics reads for an image (.../images/x.jpg -> .../labels/x.txt)"""
+    head, _, tail = image_path.rpartition(f"{os.sep}images{os.sep}")
+    return os.path.splitext(os.path.join(head, "labels", tail))[0] + ".txt"
+
+
+def read_boxes(path: str) -> Tuple[List[str], np.ndarray]:
+    """Label lines and their boxes as normalized xyxy (polygons reduced to their bounds)"""
+    if not os.path.exists(path):
+        return [], np.zeros((0, 4))
+    with open(path, encoding="utf-8") as fh:
+        lines = [line.strip() for line in fh if line.strip()]
+    boxes = []
+    for line in lines:
+        values = [float(v) for v in line.split()[1:]]
+        if len(values) == 4:
+            x, y, w, h = values
+            boxes.append((x - w / 2, y - h / 2, x + w / 2, y + h / 2))
+        else:
+            xs, ys = values[0::2], values[1::2]
+            boxes.append((min(xs), min(ys), max(xs), max(ys)))
+    return lines, np.array(boxes).reshape(-1, 4)
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two xyxy arrays"""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def build_pseudo_labeled_data(data: str, teacher: str, pseudo_conf: float, match_iou: float,
+                              batch: int = 8, root: str = DISTILL_ROOT) -> str:
+    """
+    data.yaml of a copy of the dataset whose train labels include teacher pseudo-labels
+
+    Train images are symlinked, so the shard cache (matched by real path)
+    still serves them; val and test point at the original splits.
+    """
+    from ultralytics import YOLO
+
+    images = split_images(data, ("train",))
+    stat = os.stat(teacher)
+    key = hashlib.sha256(
+        f"{dataset_fingerprint(data, images, 0)}|{os.path.abspath(teacher)}|{stat.st_size}|{stat.st_mtime_ns}"
+        f"|conf={pseudo_conf}|iou={match_iou}".encode("utf-8")
+    ).hexdigest()[:16]
+    directory = os.path.join(root, key)
+    data_path = os.path.join(directory, "data.yaml")
+    if os.path.exists(data_path):
+        print(f"✓ Pseudo-labeled dataset up to date ({directory})")
+        return data_path
+
+    print(f"🔄 Pseudo-labeling {len(images)} train image(s) with {teacher} (conf >= {pseudo_conf})")
+    shutil.rmtree(directory, ignore_errors=True)
+    image_dir = os.path.join(directory, "train", "images")
+    label_dir = os.path.join(directory, "train", "labels")
+    os.makedirs(image_dir)
+    os.makedirs(label_dir)
+
+    model = YOLO(teacher, task="detect")
+    annotated = added = 0
+    for start in range(0, len(images), batch):
+        chunk = images[start:start + batch]
+        for path, result in zip(chunk, model.predict(chunk, conf=pseudo_conf, verbose=False)):
+            lines, gt = read_boxes(label_path(path))
+            annotated += len(lines)
+            boxes = result.boxes
+            if len(boxes):
+                pred = boxes.xyxyn.cpu().numpy()
+                unmatched = box_iou(pred, gt).max(1) < match_iou if len(gt) else np.ones(len(pred), bool)
+                for (x, y, w, h), cls in zip(boxes.xywhn.cpu().numpy()[unmatched],
+                                             boxes.cls.cpu().numpy()[unmatched]):
+                    lines.append(f"{int(cls)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}")
+                    added += 1
+
+            name = os.path.basename(path)
+            try:
+                os.symlink(path, os.path.join(image_dir, name))
+            except OSError:
+                shutil.copy(path, os.path.join(image_dir, name))
+            with open(os.path.join(label_dir, os.path.splitext(name)[0] + ".txt"), "w", encoding="utf-8") as fh:
+                fh.write("\n".join(lines) + ("\n" if lines else ""))
+
+    with open(data, encoding="utf-8") as fh:
+        config = yaml.safe_load(fh)
+    base = config.pop("path", None) or os.path.dirname(os.path.abspath(data))
+    for split in ("val", "test"):
+        if config.get(split):
+            config[split] = os.path.abspath(os.path.join(base, config[split]))
+    config["train"] = os.path.abspath(image_dir)
+    # Written last: a half-built directory has no data.yaml and is rebuilt
+    with open(data_path, "w", encoding="utf-8") as fh:
+        yaml.safe_dump(config, fh, sort_keys=False)
+    print(f"✓ {annotated} annotated box(es), {added} pseudo-label(s) added -> {directory}")
+    return data_path
+
+
+def _dense_outputs(preds, nc: int):
+    """(box distributions [B, 4*reg_max, A], class logits [B, nc, A]) from raw Detect outputs"""
+    import torch
+
+    if isinstance(preds, dict):
+        if "boxes" in preds and "scores" in preds:
+            return preds["boxes"], preds["scores"]
+        preds = preds.get("one2many", preds)
+    if isinstance(preds, (list, tuple)) and preds and torch.is_tensor(preds[0]) and preds[0].dim() == 4:
+        b = preds[0].shape[0]
+        x = torch.cat([p.view(b, p.shape[1], -1) for p in preds], 2)
+        return x.split((x.shape[1] - nc, nc), 1)
+    if isinstance(preds, (list, tuple)) and len(preds) == 2:
+        # Eval mode: (decoded predictions, raw maps)
+        return _dense_outputs(preds[1], nc)
+    raise ValueError(f"Unexpected detection head output: {type(preds).__name__}")
+
+
+class DistillationLoss:
+    """Student detection loss plus a soft-target term from the teacher"""
+
+    def __init__(self, base, teacher, nc: int, cls_weight: float, box_weight: float, temperature: float):
+        self.base = base
+        self.teacher = teacher
+        self.nc = nc
+        self.cls_weight = cls_weight
+        self.box_weight = box_weight
+        self.temperature = temperature
+
+    def kd_loss(self, student_preds, images):
+        import torch
+        import torch.nn.functional as F
+
+        with torch.no_grad():
+            t_box, t_cls = _dense_outputs(self.teacher(images), self.nc)
+        s_box, s_cls = _dense_outputs(student_preds, self.nc)
+        if s_cls.shape != t_cls.shape or s_box.shape != t_box.shape:
+            raise ValueError(f"Teacher outputs {tuple(t_cls.shape)} don't match student {tuple(s_cls.shape)}")
+        t_box, t_cls, s_box, s_cls = t_box.float(), t_cls.float(), s_box.float(), s_cls.float()
+        T = self.temperature
+
+        # Per-class Bernoulli KL between softened scores, normalized like the cls loss
+        target = (t_cls / T).sigmoid()
+        kl = (F.binary_cross_entropy_with_logits(s_cls / T, target, reduction="none")
+              - F.binary_cross_entropy_with_logits(t_cls / T, target, reduction="none"))
+        weight = t_cls.sigmoid()
+        cls_kd = kl.sum() / weight.sum().clamp(min=1) * T * T
+
+        # KL between the per-side DFL distributions where the teacher sees an object
+        b, channels, anchors = s_box.shape
+        s_dist = F.log_softmax(s_box.view(b, 4, channels // 4, anchors) / T, 2)
+        t_dist = F.softmax(t_box.view(b, 4, channels // 4, anchors) / T, 2)
+        box_kl = (t_dist * (t_dist.clamp(min=1e-9).log() - s_dist)).sum((1, 2))
+        objectness = weight.max(1).values
+        box_kd = (box_kl * objectness).sum() / objectness.sum().clamp(min=1) * T * T
+
+        return self.cls_weight * cls_kd + self.box_weight * box_kd
+
+    def __call__(self, preds, batch):
+        import torch
+
+        loss, items = self.base(preds, batch)
+        kd = self.kd_loss(preds, batch["img"])
+        scaled = kd * batch["img"].shape[0]
+        # Scaled by batch size like the base loss (a scalar, or per-term on newer Ultralytics)
+        loss = loss + scaled if loss.dim() == 0 else torch.cat([loss, scaled.view(1)])
+        return loss, torch.cat([items, kd.detach().view(1)])
+
+
+def distillation_callback(teacher_path: str, cls_weight: float, box_weight: float, temperature: float):
+    """on_train_start callback swapping the student's criterion for DistillationLoss"""
+
+    def on_train_start(trainer):
+        from ultralytics import YOLO
+
+        student = getattr(trainer.model, "module", trainer.model)
+        teacher = YOLO(teacher_path, task="detect").model.float().to(trainer.device).eval()
+        for param in teacher.parameters():
+            param.requires_grad_(False)
+        nc = student.nc if hasattr(student, "nc") else len(student.names)
+        if getattr(teacher, "nc", nc) != nc:
+            raise ValueError(f"Teacher has {teacher.nc} classes, student {nc}")
+
+        # Set after the EMA copy is made, so checkpoints never contain the teacher
+        student.criterion = DistillationLoss(student.init_criterion(), teacher, nc,
+                                             cls_weight, box_weight, temperature)
+        trainer.loss_names = (*trainer.loss_names, "kd_loss")
+        print(f"✓ Distilling from {teacher_path} (T={temperature}, cls {cls_weight}, box {box_weight})")
+
+    return on_train_start
+
+
+def evaluate(artifacts: Dict[str, str], data: str, batch: int, runs: int) -> List[Dict[str, Any]]:
+    """evaluate_models.py measurements of each artifact, one fresh process each"""
+    results = []
+    images = os.path.join(os.path.dirname(os.path.abspath(data)), "test", "images")
+    for role, path in artifacts.items():
+        print(f"\n🔄 Evaluating {role}: {path}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            try:
+                result = executor.submit(measure_artifact, path, data, images, None, batch, runs, 0).result()
+            except Exception as e:
+                print(f"   ⚠️  Skipped: {e}")
+                continue
+        result["role"] = role
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the large YellowCert teacher into a small student")
+    parser.add_argument("--teacher", default="models/best_max.pt")
+    parser.add_argument("--student", default="yolov8s.pt", help="Student base model (yolov8n.pt / yolov8s.pt)")
+    parser.add_argument("--imgsz", type=int, default=640, help="Student training and serving size")
+    parser.add_argument("--data", default="data.yaml")
+    parser.add_argument("--pseudo-conf", type=float, default=0.3, help="Minimum confidence for pseudo-labels")
+    parser.add_argument("--match-iou", type=float, default=0.5,
+                        help="Teacher boxes overlapping an annotation this much are not added")
+    parser.add_argument("--temperature", type=float, default=2.0)
+    parser.add_argument("--cls-weight", type=float, default=1.0, help="Weight of the class-score KD term")
+    parser.add_argument("--box-weight", type=float, default=1.0, help="Weight of the box-distribution KD term")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE",
+                        help="Overrides for the 'default' preset the student trains with")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="Plain-trained small model to compare against (train_quick.py output)")
+    parser.add_argument("--no-publish", action="store_true", help="Don't copy the student to models/best.pt")
+    parser.add_argument("--no-report", action="store_true", help="Skip the accuracy/latency comparison")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"YellowCert Distillation: {args.teacher} -> {args.student} (imgsz {args.imgsz})")
+    print("=" * 80)
+
+    if not os.path.exists(args.teacher):
+        print(f"❌ ERROR: {args.teacher} not found. Train the teacher first (python train_max_accuracy.py).")
+        sys.exit(1)
+
+    try:
+        overrides = {
+            "model": args.student,
+            "imgsz": args.imgsz,
+            "name": "yellowcert_distill",
+            "output": "models/best.pt",
+            **training.parse_overrides(args.set),
+        }
+        data = build_pseudo_labeled_data(args.data, args.teacher, args.pseudo_conf, args.match_iou)
+        config = training.build_config("default", {**overrides, "data": data, "cache_data": args.data})
+        config["device"] = training.resolve_device(config["device"])
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+    training.print_banner(config)
+
+    callback = distillation_callback(args.teacher, args.cls_weight, args.box_weight, args.temperature)
+    try:
+        _, _, best_path = training.train(config, callbacks={"on_train_start": callback}, validate=False)
+    except RuntimeError as e:
+        if "out of memory" in str(e).lower():
+            training.print_oom_help()
+        raise
+    if not os.path.exists(best_path):
+        print("\n⚠️ Warning: Best model not found. Check training logs.")
+        sys.exit(1)
+
+    if not args.no_report:
+        artifacts = {"teacher": args.teacher, "student": best_path}
+        if os.path.exists(args.baseline):
+            artifacts["baseline"] = args.baseline
+        else:
+            print(f"⚠️  Baseline {args.baseline} not found (python train_quick.py), comparing with the teacher only")
+        results = evaluate(artifacts, args.data, batch=8, runs=30)
+        if results:
+            flag_pareto(results)
+            class_names = sorted({name for r in results for name in r["per_class"]})
+            table = format_table(results, class_names, "ap50")
+            os.makedirs(REPORT_DIR, exist_ok=True)
+            with open(os.path.join(REPORT_DIR, "report.json"), "w", encoding="utf-8") as fh:
+                json.dump({"teacher": args.teacher, "student": best_path, "config": config["train"],
+                           "results": results}, fh, indent=2, default=str)
+            with open(os.path.join(REPORT_DIR, "report.md"), "w", encoding="utf-8") as fh:
+                fh.write(table)
+            print("\n" + "=" * 80)
+            print("DISTILLATION REPORT (test split, per-class AP50, CPU)")
+            print("=" * 80 + "\n")
+            print(table)
+            by_role = {r["role"]: r for r in results}
+            student = by_role.get("student")
+            for role in ("teacher", "baseline"):
+                other = by_role.get(role)
+                if student and other:
+                    print(f"   vs {role}: mAP50-95 {student['map50_95'] - other['map50_95']:+.4f}, "
+                          f"{other['latency_ms'] / student['latency_ms']:.2f}x CPU speed")
+            print(f"\n✓ Report saved to: {REPORT_DIR}/report.json and report.md")
+
+    if not args.no_publish:
+        os.makedirs(os.path.dirname(config["output"]), exist_ok=True)
+        shutil.copy(best_path, config["output"])
+        print(f"\n✓ Student saved to: {config['output']} (restart the backend to serve it)")
+    print("=" * 80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
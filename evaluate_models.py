@@ -0,0 +1,300 @@
+"""
+YellowCert Model Evaluation - accuracy vs CPU latency across model artifacts
+
+Compares trained checkpoints (yolov8n/m/x from train_quick.py,
+train_model.py, train_max_accuracy.py) and their exported formats
+(export_model.py, quantize_model.py) on the same footing:
+
+    - mAP50, mAP50-95 and per-class AP50 / AP50-95 on the test split
+    - CPU latency: single image (median, p95) and batched (ms per image)
+    - peak resident memory of the process while serving
+
+Each artifact is measured in a fresh process, so peak memory is its own
+and not left over from the previous model. Artifacts not dominated by
+another one on (mAP50-95, single-image latency) are flagged as Pareto
+optimal. With a per-class bar (--min-class-ap), the fastest artifact
+meeting it for every class is recommended.
+
+Results go to runs/evaluate/results.json and results.md.
+
+Usage:
+    python evaluate_models.py                                   # every artifact found in models/
+    python evaluate_models.py models/best.pt models/best_max.pt models/best.onnx
+    python evaluate_models.py --min-class-ap 0.8 --class-ap signature=0.6
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import cv2
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from procstats import process_memory  # noqa: E402
+
+OUTPUT_DIR = os.path.join("runs", "evaluate")
+# Artifacts looked for in models/ when none are given
+DEFAULT_ARTIFACTS = [
+    "best.pt",
+    "best_max.pt",
+    "best.onnx",
+    "best_openvino_model",
+    "best_int8_openvino_model",
+]
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def artifact_format(path: str) -> str:
+    """Backend name of an artifact, as in MODEL_ARTIFACTS in backend/main.py"""
+    if path.endswith(".pt"):
+        return "pytorch"
+    if path.endswith(".onnx"):
+        return "onnx"
+    if "int8" in os.path.basename(os.path.normpath(path)):
+        return "openvino-int8"
+    if path.rstrip("/\\").endswith("_openvino_model"):
+        return "openvino"
+    return os.path.splitext(path)[1].lstrip(".") or "unknown"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def measure_artifact(path: str, data: str, images_dir: str, imgsz: Optional[int], batch: int,
+                     runs: int, threads: int) -> Dict[str, Any]:
+    """Latency, peak memory and test-split accuracy of one artifact (runs in a fresh process)"""
+    import torch
+    from ultralytics import YOLO
+
+    from inference import model_input_size
+
+    if threads > 0:
+        torch.set_num_threads(threads)
+    baseline_mb = process_memory().get("rss_mb")
+    model = YOLO(path, task="detect")
+    imgsz = imgsz or model_input_size(model, path)
+
+    paths = sorted(p for p in glob.glob(os.path.join(images_dir, "*"))
+                   if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+    images = [cv2.imread(p) for p in paths[:max(runs, batch)]]
+    images = [img for img in images if img is not None]
+    if not images:
+        raise RuntimeError(f"No readable images in {images_dir}")
+
+    # Single image: the shape of interactive /predict traffic
+    model(images[0], imgsz=imgsz, device="cpu", verbose=False)  # warm-up
+    single = []
+    for i in range(runs):
+        start = time.perf_counter()
+        model(images[i % len(images)], imgsz=imgsz, device="cpu", verbose=False)
+        single.append((time.perf_counter() - start) * 1000)
+
+    # Batched: the shape of micro-batched and offline traffic
+    group = [images[i % len(images)] for i in range(batch)]
+    model(group, imgsz=imgsz, device="cpu", verbose=False)  # warm-up
+    batched = []
+    for _ in range(max(1, runs // batch)):
+        start = time.perf_counter()
+        model(group, imgsz=imgsz, device="cpu", verbose=False)
+        batched.append((time.perf_counter() - start) * 1000 / batch)
+    # Peak while serving, before validation allocates its own buffers
+    peak_mb = _peak_rss_mb()
+
+    metrics = model.val(data=data, split="test", imgsz=imgsz, batch=1, device="cpu",
+                        plots=False, verbose=False)
+    names = metrics.names
+    per_class = {
+        names[int(cls)]: {"ap50": round(float(ap50), 4), "ap50_95": round(float(ap), 4)}
+        for cls, ap50, ap in zip(metrics.box.ap_class_index, metrics.box.ap50, metrics.box.ap)
+    }
+
+    return {
+        "artifact": path,
+        "format": artifact_format(path),
+        "imgsz": imgsz,
+        "size_mb": round(_artifact_size(path) / (1 << 20), 1),
+        "map50": round(float(metrics.box.map50), 4),
+        "map50_95": round(float(metrics.box.map), 4),
+        "per_class": per_class,
+        "latency_ms": round(_percentile(single, 0.5), 2),
+        "latency_p95_ms": round(_percentile(single, 0.95), 2),
+        "batch": batch,
+        "batched_ms_per_image": round(_percentile(batched, 0.5), 2),
+        "peak_rss_mb": peak_mb,
+        "baseline_rss_mb": baseline_mb,
+    }
+
+
+def _artifact_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(dirpath, name))
+                   for dirpath, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+
+def flag_pareto(results: List[Dict[str, Any]]):
+    """Mark results no other result beats on both mAP50-95 and single-image latency"""
+    for result in results:
+        result["pareto"] = not any(
+            other["map50_95"] >= result["map50_95"] and other["latency_ms"] <= result["latency_ms"]
+            and (other["map50_95"] > result["map50_95"] or other["latency_ms"] < result["latency_ms"])
+            for other in results if other is not result
+        )
+
+
+def check_bar(result: Dict[str, Any], class_names: List[str], default: float,
+              per_class: Dict[str, float], metric: str) -> List[str]:
+    """Classes below the accuracy bar (a class missing from the results counts as 0)"""
+    failing = []
+    for name in class_names:
+        bar = per_class.get(name, default)
+        if result["per_class"].get(name, {}).get(metric, 0.0) < bar:
+            failing.append(name)
+    return failing
+
+
+def format_table(results: List[Dict[str, Any]], class_names: List[str], metric: str) -> str:
+    """Markdown table: one row per artifact, one column per class"""
+    header = ["artifact", "format", "imgsz", "MB", "mAP50", "mAP50-95", "ms/img", "p95 ms",
+              "batched ms/img", "peak MB", "pareto", "bar"] + class_names
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    for r in results:
+        row = [
+            r["artifact"], r["format"], str(r["imgsz"]), f"{r['size_mb']:.1f}",
+            f"{r['map50']:.4f}", f"{r['map50_95']:.4f}", f"{r['latency_ms']:.1f}", f"{r['latency_p95_ms']:.1f}",
+            f"{r['batched_ms_per_image']:.1f} (x{r['batch']})", f"{r['peak_rss_mb']:.0f}",
+            "★" if r["pareto"] else "", "✓" if r.get("meets_bar") else "✗" if "meets_bar" in r else "",
+        ] + [f"{r['per_class'].get(name, {}).get(metric, 0.0):.3f}" for name in class_names]
+        lines.append("| " + " | ".join(row) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def dataset_class_names(data: str) -> List[str]:
+    """Class names in data.yaml order (names may be a list or an index -> name map)"""
+    with open(data, encoding="utf-8") as fh:
+        names = (yaml.safe_load(fh) or {}).get("names") or []
+    if isinstance(names, dict):
+        names = [names[index] for index in sorted(names)]
+    return [str(name) for name in names]
+
+
+def parse_class_bars(items: List[str]) -> Dict[str, float]:
+    bars = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"--class-ap '{item}' must look like class=0.6")
+        bars[name.strip()] = float(value)
+    return bars
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare YellowCert model artifacts on accuracy and CPU latency")
+    parser.add_argument("artifacts", nargs="*", help="Model artifacts (default: known ones found in models/)")
+    parser.add_argument("--data", default="data.yaml")
+    parser.add_argument("--images", default="test/images", help="Images used for latency")
+    parser.add_argument("--imgsz", type=int, default=None, help="Input size (default: each model's training imgsz)")
+    parser.add_argument("--batch", type=int, default=8, help="Batch size for batched latency")
+    parser.add_argument("--runs", type=int, default=30, help="Timed single-image runs")
+    parser.add_argument("--threads", type=int, default=0, help="torch CPU threads (0 = default)")
+    parser.add_argument("--min-class-ap", type=float, default=None, help="Accuracy bar every class must meet")
+    parser.add_argument("--class-ap", nargs="*", default=[], metavar="CLASS=AP", help="Per-class bars")
+    parser.add_argument("--bar-metric", choices=["ap50", "ap50_95"], default="ap50")
+    parser.add_argument("--output", default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("YellowCert Model Evaluation (CPU)")
+    print("=" * 80)
+
+    artifacts = args.artifacts or [os.path.join("models", name) for name in DEFAULT_ARTIFACTS
+                                   if os.path.exists(os.path.join("models", name))]
+    missing = [path for path in artifacts if not os.path.exists(path)]
+    if missing or not artifacts:
+        print(f"❌ ERROR: {', '.join(missing) if missing else 'no artifacts in models/'} not found")
+        sys.exit(1)
+    try:
+        class_bars = parse_class_bars(args.class_ap)
+        # Every dataset class is checked, including ones no model ever detects
+        class_names = dataset_class_names(args.data)
+        unknown = sorted(set(class_bars) - set(class_names))
+        if unknown:
+            raise ValueError(f"--class-ap for unknown class(es) {', '.join(unknown)} (not in {args.data})")
+    except (OSError, ValueError) as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+
+    results = []
+    for path in artifacts:
+        print(f"\n🔄 {path} ({artifact_format(path)})...")
+        # spawn, one process per artifact: peak RSS must not include earlier models
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            try:
+                result = executor.submit(measure_artifact, path, args.data, args.images, args.imgsz,
+                                         max(1, args.batch), max(1, args.runs), args.threads).result()
+            except Exception as e:
+                print(f"   ⚠️  Skipped: {e}")
+                continue
+        print(f"   mAP50 {result['map50']:.4f}, mAP50-95 {result['map50_95']:.4f}, "
+              f"{result['latency_ms']:.1f} ms/img, {result['batched_ms_per_image']:.1f} ms/img batched, "
+              f"peak {result['peak_rss_mb']:.0f} MB")
+        results.append(result)
+
+    if not results:
+        print("❌ No artifact could be evaluated")
+        sys.exit(1)
+
+    flag_pareto(results)
+    recommended = None
+    if args.min_class_ap is not None or class_bars:
+        for r in results:
+            r["failing_classes"] = check_bar(r, class_names, args.min_class_ap or 0.0, class_bars, args.bar_metric)
+            r["meets_bar"] = not r["failing_classes"]
+        passing = [r for r in results if r["meets_bar"]]
+        recommended = min(passing, key=lambda r: r["latency_ms"]) if passing else None
+
+    results.sort(key=lambda r: r["latency_ms"])
+    table = format_table(results, class_names, args.bar_metric)
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, "results.json"), "w", encoding="utf-8") as fh:
+        json.dump({
+            "data": args.data,
+            "bar": {"metric": args.bar_metric, "default": args.min_class_ap, "classes": class_bars},
+            "recommended": recommended["artifact"] if recommended else None,
+            "results": results
+        }, fh, indent=2)
+    with open(os.path.join(args.output, "results.md"), "w", encoding="utf-8") as fh:
+        fh.write(table)
+
+    print("\n" + "=" * 80)
+    print(f"RESULTS (test split, per-class {args.bar_metric}, ★ = Pareto optimal)")
+    print("=" * 80 + "\n")
+    print(table)
+    if recommended:
+        print(f"🏆 Fastest model meeting the bar: {recommended['artifact']} ({recommended['latency_ms']:.1f} ms/img)")
+    elif "meets_bar" in results[0]:
+        print("⚠️  No model meets the per-class bar")
+        for r in results:
+            print(f"   {r['artifact']}: below bar for {', '.join(r['failing_classes'])}")
+    print(f"\n✓ Results saved to: {args.output}/results.json and results.md")
+    print("=" * 80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+YellowCert Model Export - ONNX and OpenVINO for CPU serving
+
+Converts the PyTorch checkpoint produced by train_model.py (models/best.pt)
+into artifacts the backend can serve with MODEL_BACKEND=onnx or
+MODEL_BACKEND=openvino:
+
+    models/best.onnx
+    models/best_openvino_model/
+
+After exporting, every artifact is checked against the PyTorch model on
+test/images: each reference box must have a partner of the same class
+within the IoU and confidence tolerances, otherwise the script exits
+with a non-zero status.
+
+Usage:
+    python export_model.py                      # export both formats + parity check
+    python export_model.py --formats onnx       # ONNX only
+    python export_model.py --skip-export        # re-run the parity check only
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+from typing import Dict, List
+
+import cv2
+from ultralytics import YOLO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from detection import CLASS_NAMES, process_boxes  # noqa: E402
+
+# Artifact produced for each serving backend (mirrors MODEL_ARTIFACTS in backend/main.py)
+EXPORT_ARTIFACTS = {
+    "onnx": "best.onnx",
+    "openvino": "best_openvino_model",
+}
+
+
+def export_artifacts(weights: str, formats: List[str], imgsz: int) -> Dict[str, str]:
+    """Export the checkpoint and move each artifact next to it in models/"""
+    model = YOLO(weights)
+    models_dir = os.path.dirname(os.path.abspath(weights))
+    exported = {}
+
+    for fmt in formats:
+        print(f"\n🔄 Exporting {weights} to {fmt} (imgsz={imgsz})...")
+        # Dynamic shapes let the backend micro-batch several images per call
+        output = model.export(format=fmt, imgsz=imgsz, dynamic=True, half=False)
+        target = os.path.join(models_dir, EXPORT_ARTIFACTS[fmt])
+
+        if os.path.abspath(output) != os.path.abspath(target):
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            elif os.path.exists(target):
+                os.remove(target)
+            shutil.move(output, target)
+
+        exported[fmt] = target
+        print(f"✓ {fmt} artifact saved to: {target}")
+
+    return exported
+
+
+def box_iou(a: Dict[str, float], b: Dict[str, float]) -> float:
+    """IoU of two bbox dicts in x1/y1/x2/y2 form"""
+    ix1, iy1 = max(a["x1"], b["x1"]), max(a["y1"], b["y1"])
+    ix2, iy2 = min(a["x2"], b["x2"]), min(a["y2"], b["y2"])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    area_a = (a["x2"] - a["x1"]) * (a["y2"] - a["y1"])
+    area_b = (b["x2"] - b["x1"]) * (b["y2"] - b["y1"])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def unmatched_detections(
+    expected: List[Dict],
+    actual: List[Dict],
+    min_conf: float,
+    iou_tol: float,
+    conf_tol: float
+) -> List[Dict]:
+    """
+    Reference detections above min_conf with no partner of the same class
+    within the IoU and confidence tolerances
+
+    Boxes near the threshold may legitimately flip, so only confident ones
+    are checked.
+    """
+    return [
+        det for det in expected
+        if det["confidence"] >= min_conf and not any(
+            other["class"] == det["class"]
+            and box_iou(other["bbox"], det["bbox"]) >= iou_tol
+            and abs(other["confidence"] - det["confidence"]) <= conf_tol
+            for other in actual
+        )
+    ]
+
+
+def check_parity(
+    weights: str,
+    artifacts: Dict[str, str],
+    images_dir: str,
+    conf: float,
+    min_conf: float,
+    iou_tol: float,
+    conf_tol: float
+) -> bool:
+    """Compare exported artifacts with the PyTorch model image by image"""
+    reference = YOLO(weights)
+    image_paths = sorted(glob.glob(os.path.join(images_dir, "*.jpg")) + glob.glob(os.path.join(images_dir, "*.png")))
+    if not image_paths:
+        print(f"⚠️  No images found in {images_dir}")
+        return False
+
+    all_ok = True
+    for fmt, path in artifacts.items():
+        candidate = YOLO(path, task="detect")
+        checked = 0
+        mismatches = 0
+
+        for image_path in image_paths:
+            img = cv2.imread(image_path)
+            expected = process_boxes(reference(img, conf=conf, verbose=False)[0].boxes, CLASS_NAMES)
+            actual = process_boxes(candidate(img, conf=conf, verbose=False)[0].boxes, CLASS_NAMES)
+
+            checked += sum(1 for det in expected if det["confidence"] >= min_conf)
+            for det in unmatched_detections(expected, actual, min_conf, iou_tol, conf_tol):
+                mismatches += 1
+                print(f"   ✗ {os.path.basename(image_path)}: no {fmt} match for "
+                      f"{det['class']} ({det['confidence']:.2f})")
+
+        ok = mismatches == 0
+        all_ok = all_ok and ok
+        status = "✓" if ok else "❌"
+        print(f"{status} {fmt}: {checked - mismatches}/{checked} boxes matched "
+              f"(IoU ≥ {iou_tol}, |Δconf| ≤ {conf_tol}) on {len(image_paths)} images")
+
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YellowCert model for CPU serving")
+    parser.add_argument("--weights", default="models/best.pt", help="PyTorch checkpoint to export")
+    parser.add_argument("--formats", nargs="+", choices=sorted(EXPORT_ARTIFACTS), default=sorted(EXPORT_ARTIFACTS))
+    parser.add_argument("--imgsz", type=int, default=None, help="Export input size (default: training imgsz)")
+    parser.add_argument("--images", default="test/images", help="Images for the parity check")
+    parser.add_argument("--conf", type=float, default=0.1, help="Inference threshold (matches backend)")
+    parser.add_argument("--min-conf", type=float, default=0.25, help="Only check reference boxes above this")
+    parser.add_argument("--iou-tol", type=float, default=0.9)
+    parser.add_argument("--conf-tol", type=float, default=0.05)
+    parser.add_argument("--skip-export", action="store_true", help="Only run the parity check")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("YellowCert Model Export")
+    print("=" * 80)
+
+    if not os.path.exists(args.weights):
+        print(f"❌ ERROR: {args.weights} not found. Train a model first (python train_model.py).")
+        sys.exit(1)
+
+    imgsz = args.imgsz or YOLO(args.weights).overrides.get("imgsz", 640)
+    models_dir = os.path.dirname(os.path.abspath(args.weights))
+
+    if args.skip_export:
+        artifacts = {fmt: os.path.join(models_dir, EXPORT_ARTIFACTS[fmt]) for fmt in args.formats}
+    else:
+        artifacts = export_artifacts(args.weights, args.formats, imgsz)
+
+    print("\n" + "=" * 80)
+    print("PARITY CHECK AGAINST PYTORCH")
+    print("=" * 80 + "\n")
+    ok = check_parity(args.weights, artifacts, args.images, args.conf, args.min_conf, args.iou_tol, args.conf_tol)
+
+    print("\n" + "=" * 80)
+    if ok:
+        print("✅ Export complete - artifacts match the PyTorch model")
+        print("\n💡 Serve with: MODEL_BACKEND=onnx (or openvino) in backend/.env")
+    else:
+        print("❌ Parity check failed - do not deploy these artifacts")
+    print("=" * 80 + "\n")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
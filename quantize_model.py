@@ -0,0 +1,132 @@
+"""
+YellowCert INT8 Quantization - post-training quantization with an accuracy gate
+
+Quantizes the trained detector (models/best.pt) to INT8 with OpenVINO/NNCF.
+Calibration uses the validation split declared in data.yaml (valid/images).
+Both the FP32 and INT8 models are then evaluated on the test split
+(test/images) and timed on CPU.
+
+The INT8 model is only published to models/best_int8_openvino_model/
+(served with MODEL_BACKEND=openvino-int8) if neither mAP50 nor mAP50-95
+drops by more than --max-drop. Otherwise it stays in the staging
+directory and the script exits with a non-zero status.
+
+Usage:
+    python quantize_model.py                    # quantize, evaluate, publish if within 1 point
+    python quantize_model.py --max-drop 0.02    # allow up to 2 points of mAP loss
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import time
+
+import cv2
+from ultralytics import YOLO
+
+STAGING_DIR = os.path.join("runs", "quantize")
+PUBLISHED_NAME = "best_int8_openvino_model"
+
+
+def evaluate(model_path: str, data: str, imgsz: int, batch: int):
+    """Return (mAP50, mAP50-95) on the test split"""
+    model = YOLO(model_path, task="detect")
+    metrics = model.val(data=data, split="test", imgsz=imgsz, batch=batch, device="cpu",
+                        plots=False, verbose=False)
+    return metrics.box.map50, metrics.box.map
+
+
+def cpu_latency_ms(model_path: str, images_dir: str, imgsz: int, runs: int) -> float:
+    """Median single-image CPU latency over the first test images"""
+    model = YOLO(model_path, task="detect")
+    images = [cv2.imread(p) for p in sorted(glob.glob(os.path.join(images_dir, "*.jpg")))[:runs]]
+    model(images[0], imgsz=imgsz, device="cpu", verbose=False)  # warm-up
+
+    timings = []
+    for img in images:
+        start = time.perf_counter()
+        model(img, imgsz=imgsz, device="cpu", verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def quantize(weights: str, data: str, imgsz: int, fraction: float) -> str:
+    """Export an INT8 OpenVINO model calibrated on the data.yaml val split"""
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    staged = os.path.join(STAGING_DIR, os.path.basename(weights))
+    shutil.copy(weights, staged)
+
+    # Export next to the staged copy so nothing lands in models/ before the gate
+    model = YOLO(staged)
+    return model.export(format="openvino", int8=True, data=data, fraction=fraction,
+                        imgsz=imgsz, dynamic=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="INT8 post-training quantization for YellowCert")
+    parser.add_argument("--weights", default="models/best.pt")
+    parser.add_argument("--data", default="data.yaml")
+    parser.add_argument("--imgsz", type=int, default=None, help="Input size (default: training imgsz)")
+    parser.add_argument("--fraction", type=float, default=1.0,
+                        help="Fraction of valid/images used for calibration")
+    parser.add_argument("--max-drop", type=float, default=0.01,
+                        help="Largest acceptable absolute drop in mAP50 or mAP50-95")
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--latency-runs", type=int, default=20)
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("YellowCert INT8 Quantization")
+    print("=" * 80)
+
+    if not os.path.exists(args.weights):
+        print(f"❌ ERROR: {args.weights} not found. Train a model first (python train_model.py).")
+        sys.exit(1)
+
+    imgsz = args.imgsz or YOLO(args.weights).overrides.get("imgsz", 640)
+
+    print(f"\n🔄 Calibrating on the val split of {args.data} (fraction={args.fraction})...")
+    int8_path = quantize(args.weights, args.data, imgsz, args.fraction)
+    print(f"✓ INT8 model staged at: {int8_path}")
+
+    print("\n🔄 Evaluating on the test split...")
+    fp32_map50, fp32_map = evaluate(args.weights, args.data, imgsz, args.batch)
+    int8_map50, int8_map = evaluate(int8_path, args.data, imgsz, args.batch)
+
+    test_images = os.path.join(os.path.dirname(os.path.abspath(args.data)), "test", "images")
+    fp32_ms = cpu_latency_ms(args.weights, test_images, imgsz, args.latency_runs)
+    int8_ms = cpu_latency_ms(int8_path, test_images, imgsz, args.latency_runs)
+
+    drop50 = fp32_map50 - int8_map50
+    drop = fp32_map - int8_map
+
+    print("\n" + "=" * 80)
+    print("RESULTS (test split)")
+    print("=" * 80)
+    print(f"{'model':<8} {'mAP50':>8} {'mAP50-95':>10} {'CPU ms/img':>12}")
+    print(f"{'FP32':<8} {fp32_map50:>8.4f} {fp32_map:>10.4f} {fp32_ms:>12.1f}")
+    print(f"{'INT8':<8} {int8_map50:>8.4f} {int8_map:>10.4f} {int8_ms:>12.1f}")
+    print(f"\n   - mAP50 drop: {drop50:+.4f}")
+    print(f"   - mAP50-95 drop: {drop:+.4f}")
+    print(f"   - CPU speedup: {fp32_ms / int8_ms:.2f}x")
+
+    if max(drop50, drop) > args.max_drop:
+        print(f"\n❌ Accuracy drop exceeds {args.max_drop:.4f} - INT8 model NOT published")
+        print(f"   Staged model left at: {int8_path}")
+        print("=" * 80 + "\n")
+        sys.exit(1)
+
+    target = os.path.join(os.path.dirname(os.path.abspath(args.weights)), PUBLISHED_NAME)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    shutil.move(int8_path, target)
+    print(f"\n✅ INT8 model published to: {target}")
+    print("\n💡 Serve it with: MODEL_BACKEND=openvino-int8 in backend/.env")
+    print("=" * 80 + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+YellowCert Hyperparameter Sweep - parallel training trials with early pruning
+
+Runs a grid (or a random sample) of training.py configurations in
+parallel, one subprocess per trial, spread over the CPU cores or GPUs
+available. Every trial reports its validation mAP50-95 after each epoch
+to a shared SQLite file. A trial whose best mAP so far is below the
+median of the other trials at the same epoch is stopped early (median
+pruning), after a few warm-up epochs.
+
+Results are ranked by best validation mAP50-95:
+
+    runs/sweep/<name>/
+        results.md / results.csv    # ranked table
+        trials.sqlite3              # per-epoch reports
+        trial-000/                  # Ultralytics run (weights/best.pt, ...)
+        trial-000.log
+
+Usage:
+    python sweep.py --preset quick --param lr0=0.0005,0.001,0.002 --param optimizer=AdamW,SGD
+    python sweep.py --preset default --set epochs=60 --space sweep.yaml --trials 12 --jobs 3
+    python sweep.py --preset default --devices 0,1 --param model=yolov8s.pt,yolov8m.pt --publish
+
+A --space YAML maps parameters to a list of values (grid) or to
+{low, high, log} ranges (sampled; needs --trials):
+
+    lr0: {low: 0.0002, high: 0.005, log: true}
+    imgsz: [640, 1024]
+    optimizer: [AdamW, SGD]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import queue
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+import training
+from autotune import AUTOTUNE_MEMORY_FRACTION
+from dataset_cache import USE_DATASET_CACHE, ensure_cache
+
+SWEEP_ROOT = os.path.join("runs", "sweep")
+PRUNE_METRIC = "metrics/mAP50-95(B)"
+
+
+class MedianPruner:
+    """Per-epoch reports in a SQLite file shared by every trial process"""
+
+    def __init__(self, db_path: str, trial: int, warmup_epochs: int = 5, min_trials: int = 2):
+        self.trial = trial
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+        self.best = 0.0
+        self.pruned = False
+        self._conn = sqlite3.connect(db_path, timeout=30)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                "trial INTEGER NOT NULL, epoch INTEGER NOT NULL, value REAL NOT NULL, best REAL NOT NULL, "
+                "PRIMARY KEY (trial, epoch))"
+            )
+
+    def report(self, epoch: int, value: float) -> bool:
+        """Record one epoch; True if the trial should stop"""
+        self.best = max(self.best, value)
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO reports (trial, epoch, value, best) VALUES (?, ?, ?, ?)",
+                               (self.trial, epoch, value, self.best))
+            others = [row[0] for row in self._conn.execute(
+                "SELECT best FROM reports WHERE epoch = ? AND trial != ?", (epoch, self.trial)
+            )]
+        if epoch < self.warmup_epochs or len(others) < self.min_trials:
+            return False
+        return self.best < statistics.median(others)
+
+    def history(self) -> List[Tuple[int, float]]:
+        """This trial's (epoch, value) reports in epoch order"""
+        return self._conn.execute(
+            "SELECT epoch, value FROM reports WHERE trial = ? ORDER BY epoch", (self.trial,)
+        ).fetchall()
+
+    def on_fit_epoch_end(self, trainer):
+        """Ultralytics callback: stop the trainer once the trial is clearly losing"""
+        value = trainer.metrics.get(PRUNE_METRIC)
+        if value is None or self.pruned:
+            return
+        if self.report(trainer.epoch + 1, float(value)):
+            self.pruned = True
+            trainer.stop = True
+            print(f"✂️  Trial {self.trial} pruned at epoch {trainer.epoch + 1} (best mAP50-95 {self.best:.4f})")
+
+
+def load_space(path: Optional[str], params: List[str]) -> Dict[str, Any]:
+    """Search space from a YAML file plus --param key=v1,v2 entries"""
+    space: Dict[str, Any] = {}
+    if path:
+        with open(path, encoding="utf-8") as fh:
+            space.update(yaml.safe_load(fh) or {})
+    for item in params:
+        key, sep, values = item.partition("=")
+        if not sep:
+            raise ValueError(f"--param '{item}' must look like key=v1,v2")
+        space[key.strip()] = [yaml.safe_load(value) for value in values.split(",")]
+    if not space:
+        raise ValueError("Empty search space: pass --param or --space")
+    return space
+
+
+def sample_value(spec: Any, rng: random.Random) -> Any:
+    """Draw one value from a list or a {low, high, log} range"""
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    low, high = float(spec["low"]), float(spec["high"])
+    if spec.get("log"):
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    value = rng.uniform(low, high)
+    return int(round(value)) if spec.get("int") else value
+
+
+def plan_trials(space: Dict[str, Any], trials: Optional[int], seed: int) -> List[Dict[str, Any]]:
+    """Every grid point, or `trials` distinct random configurations"""
+    rng = random.Random(seed)
+    keys = sorted(space)
+    if all(isinstance(space[key], list) for key in keys):
+        grid = [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+        if trials is None or trials >= len(grid):
+            return grid
+        return rng.sample(grid, trials)
+
+    if trials is None:
+        raise ValueError("Ranges in the search space need --trials")
+    return [{key: sample_value(space[key], rng) for key in keys} for _ in range(trials)]
+
+
+def run_trial(spec_path: str):
+    """Child process entry point: train one configuration and write its result"""
+    with open(spec_path, encoding="utf-8") as fh:
+        spec = json.load(fh)
+
+    config = training.build_config(spec["preset"], spec["overrides"])
+    config["device"] = spec["device"]
+    config["train"].update(project=spec["project"], name=spec["name"], exist_ok=True)
+
+    pruner = MedianPruner(spec["db"], spec["trial"], spec["warmup_epochs"], spec["min_trials"])
+    start = time.time()
+    status, error = "complete", None
+    try:
+        training.train(config, callbacks={"on_fit_epoch_end": pruner.on_fit_epoch_end}, validate=False)
+        if pruner.pruned:
+            status = "pruned"
+    except Exception as e:
+        status, error = "failed", str(e)
+
+    reports = pruner.history()
+    with open(spec["result"], "w", encoding="utf-8") as fh:
+        json.dump({
+            "trial": spec["trial"],
+            "params": spec["params"],
+            "status": status,
+            "error": error,
+            "epochs": len(reports),
+            "best_map50_95": max((value for _, value in reports), default=None),
+            "minutes": round((time.time() - start) / 60, 2),
+            "weights": os.path.join(spec["project"], spec["name"], "weights", "best.pt"),
+        }, fh)
+    sys.exit(1 if status == "failed" else 0)
+
+
+def device_slots(devices: str, jobs: Optional[int]) -> List[Dict[str, Any]]:
+    """One entry per concurrently running trial: device, CPU threads and memory share"""
+    cores = os.cpu_count() or 1
+    if devices == "cpu":
+        count = jobs or max(1, cores // 4)
+        return [{"device": "cpu", "threads": max(1, cores // count), "memory": 1 / count} for _ in range(count)]
+
+    gpus = [device.strip() for device in devices.split(",") if device.strip()]
+    per_gpu = max(1, (jobs or len(gpus)) // len(gpus))
+    count = per_gpu * len(gpus)
+    return [{"device": int(gpu) if gpu.isdigit() else gpu, "threads": max(1, cores // count), "memory": 1 / per_gpu}
+            for gpu in gpus for _ in range(per_gpu)]
+
+
+def launch(spec: Dict[str, Any], slot: Dict[str, Any], sweep_dir: str) -> Dict[str, Any]:
+    """Run one trial subprocess on a slot and read back its result"""
+    # Copy the overrides: the caller's spec is shared and must stay as planned
+    spec = dict(spec, device=slot["device"], overrides=dict(spec["overrides"]))
+    # Keep dataloader workers within this trial's share of the cores
+    spec["overrides"].setdefault("workers", max(1, slot["threads"] // 2))
+    spec_path = os.path.join(sweep_dir, f"{spec['name']}.json")
+    with open(spec_path, "w", encoding="utf-8") as fh:
+        json.dump(spec, fh)
+
+    env = dict(os.environ)
+    threads = str(slot["threads"])
+    env.update(OMP_NUM_THREADS=threads, MKL_NUM_THREADS=threads,
+               # Trials sharing a device autotune against their share of its memory
+               AUTOTUNE_MEMORY_FRACTION=str(AUTOTUNE_MEMORY_FRACTION * slot["memory"]))
+    with open(os.path.join(sweep_dir, f"{spec['name']}.log"), "w", encoding="utf-8") as log:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--run-trial", spec_path],
+                       stdout=log, stderr=subprocess.STDOUT, env=env)
+
+    try:
+        with open(spec["result"], encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {"trial": spec["trial"], "params": spec["params"], "status": "failed",
+                "error": f"no result, see {spec['name']}.log", "epochs": 0, "best_map50_95": None,
+                "minutes": None, "weights": None}
+
+
+def write_results(results: List[Dict[str, Any]], sweep_dir: str) -> List[Dict[str, Any]]:
+    """Rank trials by best mAP50-95 and write results.csv / results.md"""
+    ranked = sorted(results, key=lambda r: (r["best_map50_95"] is None, -(r["best_map50_95"] or 0)))
+    keys = sorted({key for result in ranked for key in result["params"]})
+
+    with open(os.path.join(sweep_dir, "results.csv"), "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["rank", "trial", "status", "epochs", "mAP50-95", "minutes"] + keys)
+        for rank, r in enumerate(ranked, 1):
+            writer.writerow([rank, r["trial"], r["status"], r["epochs"], r["best_map50_95"], r["minutes"]]
+                            + [r["params"].get(key) for key in keys])
+
+    lines = [
+        "| rank | trial | status | epochs | mAP50-95 | min | " + " | ".join(keys) + " |",
+        "|" + "---|" * (6 + len(keys)),
+    ]
+    for rank, r in enumerate(ranked, 1):
+        score = f"{r['best_map50_95']:.4f}" if r["best_map50_95"] is not None else "-"
+        lines.append(f"| {rank} | {r['trial']} | {r['status']} | {r['epochs']} | {score} | {r['minutes']} | "
+                     + " | ".join(str(r["params"].get(key)) for key in keys) + " |")
+    table = "\n".join(lines) + "\n"
+    with open(os.path.join(sweep_dir, "results.md"), "w", encoding="utf-8") as fh:
+        fh.write(table)
+    print(table)
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep over training presets")
+    parser.add_argument("--preset", choices=sorted(training.PRESETS), default="quick")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE", help="Fixed overrides for every trial")
+    parser.add_argument("--param", action="append", default=[], metavar="KEY=V1,V2", help="Values to sweep")
+    parser.add_argument("--space", default=None, help="YAML search space")
+    parser.add_argument("--trials", type=int, default=None, help="Random sample size (default: full grid)")
+    parser.add_argument("--devices", default="cpu", help="'cpu' or GPU ids, e.g. 0,1")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="Trials running at once (default: cores/4 on CPU, one per GPU)")
+    parser.add_argument("--warmup-epochs", type=int, default=5, help="Never prune before this epoch")
+    parser.add_argument("--min-trials", type=int, default=2, help="Reports needed at an epoch before pruning")
+    parser.add_argument("--name", default=None, help="Sweep directory name (default: timestamp)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--publish", action="store_true", help="Copy the winner's best.pt to the preset output")
+    parser.add_argument("--run-trial", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_trial:
+        run_trial(args.run_trial)
+        return
+
+    try:
+        fixed = training.parse_overrides(args.set)
+        plans = plan_trials(load_space(args.space, args.param), args.trials, args.seed)
+        training.build_config(args.preset, fixed)
+    except (OSError, ValueError) as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+
+    sweep_dir = os.path.abspath(os.path.join(SWEEP_ROOT, args.name or time.strftime("%Y%m%d-%H%M%S")))
+    os.makedirs(sweep_dir, exist_ok=True)
+    db = os.path.join(sweep_dir, "trials.sqlite3")
+    slots = device_slots(args.devices, args.jobs)
+
+    print("=" * 80)
+    print(f"YellowCert Sweep: {len(plans)} trial(s) of preset '{args.preset}', "
+          f"{len(slots)} at a time on {args.devices}")
+    print(f"Directory: {sweep_dir}")
+    print("=" * 80)
+
+    # Build shared dataset caches up front; sizes autotune picks later are built
+    # by the first trial that needs them while the others wait (see ensure_cache)
+    if USE_DATASET_CACHE:
+        for imgsz in sorted({training.build_config(args.preset, {**fixed, **params})["train"]["imgsz"]
+                             for params in plans}):
+            ensure_cache(fixed.get("data", "data.yaml"), imgsz)
+
+    specs = []
+    for trial, params in enumerate(plans):
+        name = f"trial-{trial:03d}"
+        specs.append({
+            "trial": trial,
+            "name": name,
+            "preset": args.preset,
+            "params": params,
+            "overrides": {**fixed, **params},
+            "project": sweep_dir,
+            "db": db,
+            "result": os.path.join(sweep_dir, f"{name}.result.json"),
+            "warmup_epochs": args.warmup_epochs,
+            "min_trials": args.min_trials,
+        })
+        print(f"   {name}: {params}")
+
+    free: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    for slot in slots:
+        free.put(slot)
+
+    def run(spec: Dict[str, Any]) -> Dict[str, Any]:
+        slot = free.get()
+        try:
+            result = launch(spec, slot, sweep_dir)
+        finally:
+            free.put(slot)
+        score = f"{result['best_map50_95']:.4f}" if result["best_map50_95"] is not None else "-"
+        print(f"   {spec['name']} {result['status']} after {result['epochs']} epoch(s), mAP50-95 {score}")
+        return result
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=len(slots)) as executor:
+        results = list(executor.map(run, specs))
+
+    print("\n" + "=" * 80)
+    print(f"SWEEP RESULTS ({(time.time() - start) / 60:.1f} min)")
+    print("=" * 80 + "\n")
+    ranked = write_results(results, sweep_dir)
+
+    winner = ranked[0] if ranked and ranked[0]["best_map50_95"] is not None else None
+    if winner is None:
+        print("❌ No trial finished an epoch - check the trial logs")
+        sys.exit(1)
+    print(f"🏆 Trial {winner['trial']}: {winner['params']} -> {winner['weights']}")
+    if args.publish and winner["weights"] and os.path.exists(winner["weights"]):
+        output = training.build_config(args.preset, {**fixed, **winner["params"]})["output"]
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        shutil.copy(winner["weights"], output)
+        print(f"✓ Copied to {output}")
+
+
+if __name__ == "__main__":
+    main()
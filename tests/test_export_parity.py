@@ -0,0 +1,72 @@
+"""
+Exported ONNX / OpenVINO models must detect what the PyTorch model detects
+
+Exports models/best.pt into a temporary directory and runs the same
+test images through both. Skipped when the weights, the test images or
+the runtime for a format are not available.
+"""
+
+import glob
+import importlib.util
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("ultralytics")
+cv2 = pytest.importorskip("cv2")
+
+from detection import CLASS_NAMES, process_boxes  # noqa: E402
+from export_model import export_artifacts, unmatched_detections  # noqa: E402
+from inference import model_input_size  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEIGHTS = os.path.join(ROOT, "models", "best.pt")
+IMAGES = sorted(glob.glob(os.path.join(ROOT, "test", "images", "*.jpg")))[:8]
+# Runtime module each format needs at inference time
+RUNTIMES = {"onnx": "onnxruntime", "openvino": "openvino"}
+CONF = 0.1
+MIN_CONF = 0.25
+IOU_TOL = 0.9
+CONF_TOL = 0.05
+
+
+@pytest.fixture(scope="module")
+def reference():
+    from ultralytics import YOLO
+
+    if not os.path.exists(WEIGHTS):
+        pytest.skip(f"{WEIGHTS} not found (train a model first)")
+    if not IMAGES:
+        pytest.skip("No test images")
+    model = YOLO(WEIGHTS)
+    return model, model.overrides.get("imgsz", 640)
+
+
+@pytest.mark.parametrize("fmt", sorted(RUNTIMES))
+def test_exported_model_matches_pytorch(fmt, reference, tmp_path):
+    from ultralytics import YOLO
+
+    if importlib.util.find_spec(RUNTIMES[fmt]) is None:
+        pytest.skip(f"{RUNTIMES[fmt]} not installed")
+    model, imgsz = reference
+
+    # Export next to a copy of the weights so models/ is left alone
+    weights = shutil.copy(WEIGHTS, tmp_path / "best.pt")
+    artifact = export_artifacts(str(weights), [fmt], imgsz)[fmt]
+    exported = YOLO(artifact, task="detect")
+    # The backend letterboxes to this size, so it must match the checkpoint's
+    assert model_input_size(exported, artifact) == model_input_size(model, WEIGHTS)
+
+    checked = 0
+    failures = []
+    for path in IMAGES:
+        img = cv2.imread(path)
+        expected = process_boxes(model(img, imgsz=imgsz, conf=CONF, verbose=False)[0].boxes, CLASS_NAMES)
+        actual = process_boxes(exported(img, imgsz=imgsz, conf=CONF, verbose=False)[0].boxes, CLASS_NAMES)
+        checked += sum(1 for det in expected if det["confidence"] >= MIN_CONF)
+        failures += [(os.path.basename(path), det["class"], round(det["confidence"], 3))
+                     for det in unmatched_detections(expected, actual, MIN_CONF, IOU_TOL, CONF_TOL)]
+
+    assert checked > 0, "The reference model detected nothing to compare"
+    assert not failures, f"{len(failures)}/{checked} {fmt} box(es) without a match: {failures}"
@@ -0,0 +1,357 @@
+"""
+YellowCert Training - config-driven training with quick/default/max presets
+
+One module behind train_quick.py, train_model.py and train_max_accuracy.py
+(and the sweep runner, sweep.py). A preset is a base model, the
+model.train() arguments, where to publish the best weights and how to
+validate them; any argument can be overridden from the command line.
+
+Usage:
+    python training.py --preset quick                         # same as train_quick.py
+    python training.py --preset default                       # same as train_model.py
+    python training.py --preset max                           # same as train_max_accuracy.py
+    python training.py --preset default --set epochs=50 lr0=0.002 model=yolov8s.pt
+    python training.py --list                                 # show presets
+"""
+
+import argparse
+import copy
+import os
+import shutil
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+from autotune import USE_AUTOTUNE, autotune
+from dataset_cache import train_with_cache
+
+# Augmentation shared by the default and max presets
+_AUGMENT = {
+    "hsv_h": 0.015,             # HSV-Hue augmentation
+    "hsv_s": 0.7,               # HSV-Saturation augmentation
+    "hsv_v": 0.4,               # HSV-Value augmentation
+    "degrees": 10.0,            # Rotation augmentation (+/- deg)
+    "translate": 0.1,           # Translation augmentation (+/- fraction)
+    "scale": 0.5,               # Scaling augmentation (+/- gain)
+    "shear": 0.0,               # Shear augmentation (+/- deg)
+    "perspective": 0.0,         # Perspective augmentation (+/- fraction)
+    "flipud": 0.0,              # Flip up-down probability
+    "fliplr": 0.5,              # Flip left-right probability
+    "mosaic": 1.0,              # Mosaic augmentation probability
+    "mixup": 0.1,               # MixUp augmentation probability
+    "copy_paste": 0.1,          # Copy-paste augmentation probability
+}
+
+PRESETS: Dict[str, Dict[str, Any]] = {
+    "quick": {
+        "title": "Quick training mode - 10 epochs for testing",
+        "model": "yolov8n.pt",
+        "device": "cpu",
+        "output": "models/best.pt",
+        "autotune": ["batch"],
+        "train": {
+            "data": "data.yaml",
+            "epochs": 10,
+            "imgsz": 640,
+            "batch": 8,
+            "name": "yellowcert_quick",
+            "workers": 4,
+            "project": "runs/detect",
+            "exist_ok": True,
+            "pretrained": True,
+            "verbose": True,
+        },
+        "val": {},
+    },
+    "default": {
+        "title": "YellowCert Training - OPTIMIZED FOR MAXIMUM RESULTS",
+        "highlights": [
+            "Model: YOLOv8m (medium) for better accuracy",
+            "Epochs: 200 with early stopping (patience=50)",
+            "Optimizer: AdamW with learning rate scheduling",
+            "Data Augmentation: HSV, Rotation, Mosaic, MixUp, Copy-Paste",
+            "Advanced: AMP training, Image caching, Label smoothing",
+            "Close mosaic in final 10 epochs for precision",
+        ],
+        "model": "yolov8m.pt",
+        "device": "auto",
+        "output": "models/best.pt",
+        "autotune": ["batch", "imgsz"],     # imgsz is only lowered if nothing fits (see autotune.py)
+        "train": {
+            "data": "data.yaml",
+            "epochs": 200,
+            "imgsz": 1024,              # Matches medical certificate resolution
+            "batch": 16,
+            "name": "yellowcert_model",
+            "patience": 50,
+            "save": True,
+            "workers": 8,
+            "project": "runs/detect",
+            "exist_ok": True,
+            "pretrained": True,
+            "verbose": True,
+            "plots": True,
+            "optimizer": "AdamW",
+            "lr0": 0.001,
+            "lrf": 0.01,                # Final learning rate (lr0 * lrf)
+            "momentum": 0.937,
+            "weight_decay": 0.0005,
+            **_AUGMENT,
+            "close_mosaic": 10,         # Disable mosaic in the final N epochs for better precision
+            "amp": True,
+            "cache": True,              # Fallback RAM cache when DATASET_CACHE=0 (see dataset_cache.py)
+            "label_smoothing": 0.1,
+            "val": True,
+            "save_period": 10,
+        },
+        "val": {},
+    },
+    "max": {
+        "title": "YellowCert Training - MAXIMUM ACCURACY MODE",
+        "highlights": [
+            "Model: YOLOv8x (extra-large) - Best possible accuracy",
+            "Epochs: 300 with early stopping (patience=100)",
+            "Image size: 1280x1280 for maximum detail",
+            "Optimizer: AdamW with fine-tuned learning rate",
+            "Enhanced data augmentation pipeline",
+            "TTA (Test-Time Augmentation) enabled",
+            "Multi-scale training",
+        ],
+        "model": "yolov8x.pt",
+        "device": "cuda",           # Requires a CUDA GPU (16GB+ VRAM recommended)
+        "output": "models/best_max.pt",
+        "autotune": ["batch", "imgsz"],
+        "train": {
+            "data": "data.yaml",
+            "epochs": 300,
+            "imgsz": 1280,
+            "batch": 8,                 # Smaller batch due to larger model
+            "name": "yellowcert_max",
+            "patience": 100,
+            "save": True,
+            "workers": 8,
+            "project": "runs/detect",
+            "exist_ok": True,
+            "pretrained": True,
+            "verbose": True,
+            "plots": True,
+            "optimizer": "AdamW",
+            "lr0": 0.0005,              # Lower learning rate for large model
+            "lrf": 0.001,
+            "momentum": 0.937,
+            "weight_decay": 0.0005,
+            **_AUGMENT,
+            "hsv_h": 0.02,
+            "degrees": 15.0,
+            "translate": 0.15,
+            "scale": 0.7,
+            "shear": 2.0,
+            "perspective": 0.0005,
+            "mixup": 0.15,
+            "copy_paste": 0.15,
+            "close_mosaic": 15,
+            "amp": True,
+            "cache": True,              # Fallback RAM cache when DATASET_CACHE=0 (see dataset_cache.py)
+            "label_smoothing": 0.1,
+            "rect": False,              # Full multi-scale
+            "val": True,
+            "save_period": 10,
+        },
+        # Final validation with Test-Time Augmentation
+        "val": {"imgsz": 1280, "batch": 4, "augment": True},
+    },
+}
+
+# Keys of a preset that are not model.train() arguments
+_PRESET_KEYS = {"title", "highlights", "model", "device", "output", "autotune", "cache_data", "train", "val"}
+# Settings autotune.py may change
+_TUNABLE = ["batch", "imgsz"]
+
+
+def parse_overrides(items: List[str]) -> Dict[str, Any]:
+    """key=value strings to a dict, values parsed as YAML scalars (0.001, true, AdamW)"""
+    overrides = {}
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Override '{item}' must look like key=value")
+        overrides[key.strip()] = yaml.safe_load(value)
+    return overrides
+
+
+def build_config(preset: str, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Copy of a preset with overrides applied
+
+    Preset-level keys (model, device, output, autotune, cache_data) replace the
+    preset's value; anything else is a model.train() argument. An explicit
+    batch or imgsz is used as given rather than autotuned.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset '{preset}' (expected one of {sorted(PRESETS)})")
+    config = copy.deepcopy(PRESETS[preset])
+    # autotune first, so an explicit batch/imgsz still wins over autotune=true
+    for key, value in sorted((overrides or {}).items(), key=lambda item: item[0] != "autotune"):
+        if key == "autotune":
+            # autotune=true/false, or the keys to tune (autotune=batch)
+            config[key] = list(_TUNABLE) if value is True else [] if not value else \
+                [value] if isinstance(value, str) else list(value)
+        elif key in _PRESET_KEYS - {"train", "val"}:
+            config[key] = value
+        else:
+            config["train"][key] = value
+            if key in config["autotune"]:
+                config["autotune"] = [tuned for tuned in config["autotune"] if tuned != key]
+    return config
+
+
+def resolve_device(device: Any):
+    """'auto' -> first CUDA GPU or CPU; 'cuda' -> GPU 0 or an error"""
+    import torch
+
+    if device == "auto":
+        return 0 if torch.cuda.is_available() else "cpu"
+    if device == "cuda":
+        if not torch.cuda.is_available():
+            raise RuntimeError("This preset requires a CUDA GPU. Use --preset default for CPU/MPS training.")
+        return 0
+    return device
+
+
+def run_dir(config: Dict[str, Any]) -> str:
+    """Directory Ultralytics writes this run to"""
+    return os.path.join(config["train"].get("project", "runs/detect"), config["train"]["name"])
+
+
+def train(config: Dict[str, Any], callbacks: Optional[Dict[str, Callable]] = None, validate: bool = True):
+    """
+    Train one configuration; returns (model, validation metrics, best.pt path)
+
+    callbacks maps Ultralytics events (e.g. on_fit_epoch_end) to functions
+    taking the trainer, as used by the sweep runner for pruning. batch
+    and imgsz are autotuned first when the config asks for it. With
+    validate=False the final validation pass is skipped (metrics is None).
+    """
+    from ultralytics import YOLO
+
+    device = resolve_device(config["device"])
+    if USE_AUTOTUNE and config.get("autotune"):
+        config["train"].update(autotune(
+            config["model"], device,
+            imgsz=config["train"].get("imgsz", 640),
+            batch=config["train"].get("batch", 16),
+            tune=config["autotune"],
+            amp=config["train"].get("amp", True) and device != "cpu"
+        ))
+
+    model = YOLO(config["model"])
+    for event, callback in (callbacks or {}).items():
+        model.add_callback(event, callback)
+
+    train_with_cache(model, cache_data=config.get("cache_data"), device=device, **config["train"])
+
+    best_path = os.path.join(run_dir(config), "weights", "best.pt")
+    if not validate:
+        return model, None, best_path
+    metrics = model.val(data=config["train"].get("data", "data.yaml"), **config["val"]) if config["val"] else model.val()
+    return model, metrics, best_path
+
+
+def print_banner(config: Dict[str, Any]):
+    print("=" * 80)
+    print(config["title"])
+    print("=" * 80)
+    if config.get("highlights"):
+        print("\nOptimizations enabled:")
+        for line in config["highlights"]:
+            print(f"  ✓ {line}")
+    tuned = f" (autotuning {', '.join(config['autotune'])})" if config.get("autotune") and USE_AUTOTUNE else ""
+    print(f"\nModel: {config['model']}, device: {config['device']}, imgsz: {config['train'].get('imgsz')}, "
+          f"batch: {config['train'].get('batch')}, epochs: {config['train'].get('epochs')}{tuned}")
+    print("\n" + "=" * 80 + "\n")
+
+
+def print_oom_help():
+    print("\n" + "=" * 80)
+    print("❌ OUT OF MEMORY ERROR")
+    print("=" * 80)
+    print("\nSuggestions to fix:")
+    print("  1. Reduce batch size (--set batch=4 or batch=2), or lower AUTOTUNE_MEMORY_FRACTION")
+    print("  2. Reduce image size (--set imgsz=1024 or imgsz=640)")
+    print("  3. Use a smaller model (--preset default, or --set model=yolov8m.pt)")
+    print("  4. Close other GPU applications")
+    print("=" * 80 + "\n")
+
+
+def run_preset(preset: str, overrides: Optional[Dict[str, Any]] = None, publish: bool = True) -> Optional[str]:
+    """Train a preset end to end and copy the best weights to its output path"""
+    config = build_config(preset, overrides)
+    print_banner(config)
+
+    try:
+        config["device"] = resolve_device(config["device"])
+    except RuntimeError as e:
+        print(f"❌ ERROR: {e}")
+        return None
+    print(f"Using device: {config['device']}")
+
+    try:
+        _, metrics, best_path = train(config)
+    except RuntimeError as e:
+        if "out of memory" in str(e).lower():
+            print_oom_help()
+        raise
+
+    if not os.path.exists(best_path):
+        print("\n⚠️ Warning: Best model not found. Check training logs.")
+        return None
+
+    if publish:
+        os.makedirs(os.path.dirname(config["output"]) or ".", exist_ok=True)
+        shutil.copy(best_path, config["output"])
+
+    print("\n" + "=" * 80)
+    print("TRAINING COMPLETED SUCCESSFULLY!")
+    print("=" * 80)
+    if publish:
+        print(f"\n✓ Best model saved to: {config['output']}")
+    print(f"✓ All results saved to: {run_dir(config)}/")
+    if hasattr(metrics, "box"):
+        print(f"\n📊 Final Metrics:")
+        print(f"   - mAP50: {metrics.box.map50:.4f}")
+        print(f"   - mAP50-95: {metrics.box.map:.4f}")
+        print(f"   - Precision: {metrics.box.mp:.4f}")
+        print(f"   - Recall: {metrics.box.mr:.4f}")
+    if publish and config["output"] != "models/best.pt":
+        print(f"\n💡 To use this model in the app: cp {config['output']} models/best.pt and restart the backend")
+    print("=" * 80 + "\n")
+    return best_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the YellowCert detector from a preset")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="default")
+    parser.add_argument("--set", nargs="*", default=[], metavar="KEY=VALUE",
+                        help="Override model/device/output/autotune or any model.train() argument")
+    parser.add_argument("--no-publish", action="store_true", help="Don't copy best.pt to the preset's output")
+    parser.add_argument("--list", action="store_true", help="Print the presets and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, preset in PRESETS.items():
+            print(f"{name}: {preset['model']} on {preset['device']} -> {preset['output']} "
+                  f"(autotune: {', '.join(preset['autotune']) or 'off'})")
+            print(yaml.safe_dump(preset["train"], sort_keys=False))
+        return
+
+    try:
+        overrides = parse_overrides(args.set)
+        run_preset(args.preset, overrides, publish=not args.no_publish)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()